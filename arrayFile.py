@@ -0,0 +1,80 @@
+import json
+import mmap
+import struct
+
+import numpy as np
+
+# Self-describing raw array files: a short magic string, a JSON header with
+# dtype/shape/metadata, then the array data in C order. The data starts on a
+# 64-byte boundary so it can be opened with np.memmap without any copying.
+# (Plain .npy headers only accept descr/fortran_order/shape, so they cannot
+# carry the sweep or view parameters alongside the data.)
+MAGIC = b"CHAOSARR"
+ALIGNMENT = 64
+
+
+# Encode the header block (magic + length + padded JSON) for an array layout
+def _encode_header(shape, dtype, metadata):
+    header = {
+        "dtype": np.dtype(dtype).str,
+        "shape": [int(n) for n in shape],
+        "metadata": metadata or {},
+    }
+    text = json.dumps(header, sort_keys=True).encode("utf-8")
+    prefix = len(MAGIC) + 4
+    padded = -(-(prefix + len(text) + 1) // ALIGNMENT) * ALIGNMENT
+    text += b" " * (padded - prefix - len(text) - 1) + b"\n"
+    return MAGIC + struct.pack("<I", len(text)) + text
+
+
+# Read the header of an array file, returning (header dict, data offset)
+def read_header(filename):
+    with open(filename, "rb") as file:
+        magic = file.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not an array file (bad magic {magic!r})")
+        (length,) = struct.unpack("<I", file.read(4))
+        header = json.loads(file.read(length).decode("utf-8"))
+    return header, len(MAGIC) + 4 + length
+
+
+# Create a new array file and return it as a writable memory map
+def create_array_file(filename, shape, dtype, metadata=None):
+    block = _encode_header(shape, dtype, metadata)
+    with open(filename, "wb") as file:
+        file.write(block)
+    if int(np.prod(shape)) == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(filename, dtype=dtype, mode="r+", offset=len(block), shape=tuple(shape))
+
+
+# Open an existing array file as a memory map, returning (array, metadata);
+# the file size is checked against the header so truncated writes are caught
+def open_array_file(filename, mode="r"):
+    header, offset = read_header(filename)
+    dtype = np.dtype(header["dtype"])
+    shape = tuple(header["shape"])
+    expected = offset + int(np.prod(shape)) * dtype.itemsize
+    with open(filename, "rb") as file:
+        file.seek(0, 2)
+        size = file.tell()
+    if size != expected:
+        raise ValueError(f"{filename} holds {size} bytes but its header describes {expected}")
+    if int(np.prod(shape)) == 0:
+        return np.zeros(shape, dtype=dtype), header["metadata"]
+    return np.memmap(filename, dtype=dtype, mode=mode, offset=offset, shape=shape), header["metadata"]
+
+
+# Rows [start, stop) of an array from open_array_file as an in-memory copy. A
+# memory map is read with plain file I/O, so streaming through a file larger
+# than RAM does not leave its pages resident in this process
+def read_rows(array, start, stop):
+    if not (isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap) and array.filename):
+        return np.array(array[start:stop])
+    row_shape = array.shape[1:]
+    row_items = int(np.prod(row_shape))
+    stop = min(stop, array.shape[0])
+    with open(array.filename, "rb") as file:
+        file.seek(array.offset + start * row_items * array.dtype.itemsize)
+        data = np.fromfile(file, dtype=array.dtype, count=max(stop - start, 0) * row_items)
+    return data.reshape((-1,) + row_shape)
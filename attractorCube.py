@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+
+from arrayFile import create_array_file, open_array_file
+from logisticMap import DEFAULT_SAMPLES, DEFAULT_TRANSIENT, bifurcation_samples
+
+# Precomputed attractor cube: the post-transient samples of every (initial
+# population, growth rate) pair of two grids, stored as a float32 array file of
+# shape (len(initial_populations), len(growth_rates), samples) so one slider
+# position is one contiguous, memory-mapped slice. The samples of each pair are
+# stored sorted: the bifurcation diagram only needs the set of visited values,
+# and sorted samples can be interpolated between neighbouring slices as
+# quantiles (a 2-cycle stays two lines instead of blending into their mean).
+# Pairs that have not been computed yet hold NaN, so an interrupted build resumes.
+MATCH_TOLERANCE = 1e-12  # Grid values closer than this are treated as the same value
+
+
+# Indices (new_index, old_index) of the values of `new` that also occur in the sorted array `old`
+def _match(old, new, tolerance=MATCH_TOLERANCE):
+    if old.size == 0 or new.size == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    right = np.clip(np.searchsorted(old, new), 0, old.size - 1)
+    left = np.clip(right - 1, 0, old.size - 1)
+    nearest = np.where(np.abs(old[left] - new) <= np.abs(old[right] - new), left, right)
+    matched = np.abs(old[nearest] - new) <= tolerance
+    return np.nonzero(matched)[0], nearest[matched]
+
+
+# Build (or bring up to date) the cube file for the given grids. An existing
+# file with the same grids only gets its missing pairs computed; one with other
+# grids but the same transient and samples donates every pair both grids share,
+# so refining either resolution only computes the new values.
+# progress(done, total) is called after each chunk of computed pairs.
+def build_attractor_cube(filename, initial_populations, growth_rates, transient=DEFAULT_TRANSIENT,
+                         samples=DEFAULT_SAMPLES, chunk_size=1 << 16, progress=None):
+    initial_populations = np.asarray(initial_populations, dtype=np.float64)
+    growth_rates = np.asarray(growth_rates, dtype=np.float64)
+    metadata = {
+        "initial_populations": initial_populations.tolist(),
+        "growth_rates": growth_rates.tolist(),
+        "transient": transient,
+        "samples": samples,
+    }
+    shape = (initial_populations.size, growth_rates.size, samples)
+
+    old, old_metadata = None, None
+    if os.path.exists(filename):
+        try:
+            old, old_metadata = open_array_file(filename)
+        except ValueError:
+            old = None
+
+    if old is not None and old_metadata == metadata:
+        # Same layout: resume in place
+        del old
+        cube, _ = open_array_file(filename, mode="r+")
+        target = filename
+    else:
+        target = filename + ".tmp"
+        cube = create_array_file(target, shape, np.float32, metadata)
+        cube[...] = np.nan
+        if (old is not None and old_metadata.get("transient") == transient
+                and old_metadata.get("samples") == samples):
+            new_rows, old_rows = _match(np.asarray(old_metadata["initial_populations"]), initial_populations)
+            new_columns, old_columns = _match(np.asarray(old_metadata["growth_rates"]), growth_rates)
+            for new_row, old_row in zip(new_rows, old_rows):
+                cube[new_row, new_columns] = old[old_row, old_columns]
+        del old
+
+    # Compute every pair that is still missing, chunk_size pairs at a time
+    rows, columns = np.nonzero(np.isnan(cube[:, :, 0]))
+    for start in range(0, rows.size, chunk_size):
+        stop = start + chunk_size
+        block = bifurcation_samples(growth_rates[columns[start:stop]], initial_populations[rows[start:stop]],
+                                    transient, samples)
+        block.sort(axis=1)
+        cube[rows[start:stop], columns[start:stop]] = block
+        if progress is not None:
+            progress(min(stop, rows.size), rows.size)
+
+    if isinstance(cube, np.memmap):
+        cube.flush()
+    del cube
+    if target != filename:
+        os.replace(target, filename)
+    return metadata
+
+
+# Read-only view of a cube file with nearest-slice and interpolated lookups.
+# Initial populations 0 and 1 (which maps to 0) are degenerate: their slices
+# are all zeros whatever the growth rate, so they only answer for exactly
+# those values and every other population is served by the interior slices.
+class AttractorCube:
+    def __init__(self, filename):
+        self.data, self.metadata = open_array_file(filename)
+        self.initial_populations = np.asarray(self.metadata["initial_populations"])
+        self.growth_rates = np.asarray(self.metadata["growth_rates"])
+        self.samples = self.metadata["samples"]
+        interior = (self.initial_populations > 0) & (self.initial_populations < 1)
+        self._interior = np.nonzero(interior)[0]
+
+    # Slice indices that may serve initial_population
+    def _candidates(self, initial_population):
+        if 0 < initial_population < 1 and self._interior.size:
+            return self._interior
+        return np.arange(self.initial_populations.size)
+
+    # Index of the slice whose initial population is closest to initial_population
+    def nearest_index(self, initial_population):
+        candidates = self._candidates(initial_population)
+        return int(candidates[np.argmin(np.abs(self.initial_populations[candidates] - initial_population))])
+
+    # (len(growth_rates), samples) populations for initial_population: the nearest
+    # stored slice (a memory-mapped view), or with interpolate=True the sorted
+    # samples of the two neighbouring slices blended linearly (beyond the
+    # outermost interior slices, the nearest one)
+    def lookup(self, initial_population, interpolate=False):
+        candidates = self._candidates(initial_population)
+        if not interpolate or candidates.size == 1:
+            return self.data[self.nearest_index(initial_population)]
+        populations = self.initial_populations[candidates]
+        upper = int(np.clip(np.searchsorted(populations, initial_population), 1, populations.size - 1))
+        lower = upper - 1
+        x_lower, x_upper = populations[lower], populations[upper]
+        weight = float(np.clip((initial_population - x_lower) / (x_upper - x_lower), 0.0, 1.0))
+        if weight == 0.0:
+            return self.data[candidates[lower]]
+        if weight == 1.0:
+            return self.data[candidates[upper]]
+        return (1.0 - weight) * self.data[candidates[lower]] + weight * self.data[candidates[upper]]
+
+    # (growth_rate, population) columns like logisticMap.bifurcation()
+    def columns(self, initial_population, interpolate=False):
+        populations = self.lookup(initial_population, interpolate)
+        return np.repeat(self.growth_rates, self.samples), np.asarray(populations).ravel()
@@ -0,0 +1,215 @@
+import numpy as np
+
+from arrayFile import create_array_file, open_array_file
+from logisticMap import DEFAULT_SAMPLES, DEFAULT_TRANSIENT, logistic_step
+
+# Period detection for the logistic map: after the transient every orbit is
+# iterated in windows of 2 * max_period generations and checked for the
+# smallest period p whose last cycle repeats the one before it within
+# `tolerance`. Orbits leave the sweep as soon as their cycle is confirmed and
+# keep only their p distinct points; orbits still unresolved after
+# max_generations are labelled period 0 (chaotic, or too close to a
+# bifurcation to settle) and keep a capped sample set instead.
+DEFAULT_MAX_PERIOD = 64
+DEFAULT_TOLERANCE = 1e-9
+SUBPERIOD_MARGIN = 1e3  # A cycle that nearly repeats a divisor of its period is still converging
+DEFAULT_MAX_GENERATIONS = 4096
+DEFAULT_CHUNK_SIZE = 65536  # Growth rates iterated together; bounds the (2 * max_period, chunk) history
+COLUMNS = ("growth_rate", "population", "period")
+
+
+# Smallest period p <= max_period of every column of a (window, n) history
+# (window >= 2 * max_period), or 0 where none repeats within tolerance
+def _detect_periods(history, max_period, tolerance):
+    periods = np.zeros(history.shape[1], dtype=np.int32)
+    for p in range(1, max_period + 1):
+        unresolved = np.nonzero(periods == 0)[0]
+        if unresolved.size == 0:
+            break
+        # Cheap test on the newest value first, the whole window only for the survivors;
+        # checking every generation of the window keeps slowly converging orbits
+        # (which barely move from one cycle to the next) from passing as cycles
+        latest = history[-1, unresolved] - history[-1 - p, unresolved]
+        unresolved = unresolved[np.abs(latest) <= tolerance]
+        if unresolved.size == 0:
+            continue
+        shifted = history[p:, unresolved] - history[:-p, unresolved]
+        repeats = np.all(np.abs(shifted) <= tolerance, axis=0)
+        # An orbit spiralling into a p/d-cycle passes the p test before the p/d one;
+        # leave it for a later window unless every proper divisor is clearly ruled out
+        for d in range(1, p):
+            if p % d == 0 and repeats.any():
+                candidates = unresolved[repeats]
+                shifted = history[d:, candidates] - history[:-d, candidates]
+                repeats[repeats] = ~np.all(np.abs(shifted) <= SUBPERIOD_MARGIN * tolerance, axis=0)
+        periods[unresolved[repeats]] = p
+    return periods
+
+
+# Compact attractors (see attractors()) of one block of growth rates
+def _attractor_chunk(growth_rates, initial_population, transient, max_period, tolerance, chaotic_samples,
+                     max_generations, dtype):
+    periods = np.zeros(growth_rates.size, dtype=np.int32)
+    populations = np.full(growth_rates.shape, initial_population, dtype=dtype)
+    scratch = np.empty_like(populations)
+    for _ in range(transient):
+        logistic_step(growth_rates, populations, scratch)
+
+    # Iterate only the orbits whose period is not known yet
+    index = np.arange(growth_rates.size)
+    rates = growth_rates.copy()
+    window = 2 * max_period
+    history = np.empty((window, index.size), dtype=dtype)
+    cycles = []  # (indices, (p, count) cycle points) per detected period
+    generation = transient
+    while index.size and generation < max_generations:
+        for gen in range(window):
+            history[gen] = logistic_step(rates, populations, scratch)
+        generation += window
+
+        found = _detect_periods(history, max_period, tolerance)
+        if found.any():
+            for p in np.unique(found[found > 0]):
+                columns = np.nonzero(found == p)[0]
+                cycles.append((index[columns], np.sort(history[-p:, columns], axis=0)))
+                periods[index[columns]] = p
+            active = found == 0
+            index, rates, populations = index[active], rates[active], populations[active]
+            history = np.ascontiguousarray(history[:, active])
+            scratch = scratch[:index.size]
+
+    # Capped samples of the orbits that never settled
+    chaotic = np.empty((chaotic_samples, index.size), dtype=dtype)
+    for gen in range(chaotic_samples):
+        chaotic[gen] = logistic_step(rates, populations, scratch)
+
+    lengths = np.where(periods > 0, periods, chaotic_samples)
+    offsets = np.zeros(growth_rates.size + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    points = np.empty(offsets[-1], dtype=dtype)
+    for indices, values in cycles + [(index, chaotic)]:
+        if indices.size:
+            positions = offsets[indices][np.newaxis, :] + np.arange(values.shape[0])[:, np.newaxis]
+            points[positions] = values
+    return periods, offsets, points
+
+
+# Attractor of every growth rate, stored compactly: returns (periods, offsets,
+# points) where the attractor of growth_rates[i] is points[offsets[i]:offsets[i + 1]],
+# its p distinct cycle points (sorted) when periods[i] == p > 0, or the last
+# chaotic_samples values of the orbit when periods[i] == 0. The growth rates
+# are swept chunk_size at a time so the working history stays bounded.
+def attractors(growth_rates, initial_population, transient=DEFAULT_TRANSIENT, max_period=DEFAULT_MAX_PERIOD,
+               tolerance=DEFAULT_TOLERANCE, chaotic_samples=DEFAULT_SAMPLES,
+               max_generations=DEFAULT_MAX_GENERATIONS, dtype=np.float64, chunk_size=DEFAULT_CHUNK_SIZE):
+    growth_rates = np.asarray(growth_rates, dtype=dtype)
+    chunks = [_attractor_chunk(growth_rates[start:start + chunk_size], initial_population, transient,
+                               max_period, tolerance, chaotic_samples, max_generations, dtype)
+              for start in range(0, growth_rates.size, chunk_size)]
+    if not chunks:
+        return np.zeros(0, dtype=np.int32), np.zeros(1, dtype=np.int64), np.empty(0, dtype=dtype)
+    periods = np.concatenate([chunk_periods for chunk_periods, _, _ in chunks])
+    offsets = np.zeros(periods.size + 1, dtype=np.int64)
+    np.cumsum(np.concatenate([np.diff(chunk_offsets) for _, chunk_offsets, _ in chunks]), out=offsets[1:])
+    points = np.concatenate([chunk_points for _, _, chunk_points in chunks])
+    return periods, offsets, points
+
+
+# Expand compact attractors into (growth_rate, population, period) columns, one row per stored point
+def attractor_columns(growth_rates, periods, offsets, points):
+    lengths = np.diff(offsets)
+    return np.repeat(growth_rates, lengths), points, np.repeat(periods, lengths)
+
+
+# Write compact attractors as (growth_rate, population, period) columns to a
+# memory-mappable array file; csv_filename adds a CSV copy of the same rows
+def export_attractors(filename, growth_rates, initial_population, transient=DEFAULT_TRANSIENT,
+                      max_period=DEFAULT_MAX_PERIOD, tolerance=DEFAULT_TOLERANCE,
+                      chaotic_samples=DEFAULT_SAMPLES, max_generations=DEFAULT_MAX_GENERATIONS,
+                      dtype=np.float32, csv_filename=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    growth_rates = np.asarray(growth_rates, dtype=np.float64)
+    periods, offsets, points = attractors(growth_rates, initial_population, transient, max_period,
+                                          tolerance, chaotic_samples, max_generations, chunk_size=chunk_size)
+    rates, populations, point_periods = attractor_columns(growth_rates, periods, offsets, points)
+    metadata = {
+        "columns": list(COLUMNS),
+        "transient": transient,
+        "max_period": max_period,
+        "tolerance": tolerance,
+        "chaotic_samples": chaotic_samples,
+        "max_generations": max_generations,
+        "initial_population": initial_population,
+    }
+    columns = create_array_file(filename, (len(COLUMNS), rates.size), dtype, metadata)
+    columns[0] = rates
+    columns[1] = populations
+    columns[2] = point_periods
+    if isinstance(columns, np.memmap):
+        columns.flush()
+    if csv_filename is not None:
+        with open(csv_filename, "w") as csv_file:
+            csv_file.write("Growth Rate,Population,Period\n")
+            np.savetxt(csv_file, np.column_stack((rates, populations, point_periods)),
+                       fmt=("%.17g", "%.17g", "%d"), delimiter=",")
+    return periods, offsets, points
+
+
+# Open exported attractors, returning (growth_rates, populations, periods, metadata) as mapped columns
+def load_attractors(filename):
+    columns, metadata = open_array_file(filename)
+    return columns[0], columns[1], columns[2], metadata
+
+
+# Runs of equal period along the growth rate grid, as (period, first r, last r) tuples
+def period_runs(growth_rates, periods):
+    if len(periods) == 0:
+        return []
+    starts = np.concatenate(([0], np.nonzero(np.diff(periods))[0] + 1))
+    stops = np.concatenate((starts[1:], [len(periods)]))
+    return [(int(periods[start]), float(growth_rates[start]), float(growth_rates[stop - 1]))
+            for start, stop in zip(starts, stops)]
+
+
+# Period-doubling cascade: (period, onset r, Feigenbaum ratio estimate) for
+# periods 2, 4, 8, ... as long as the grid resolves them. The ratio
+# (r_k - r_(k-1)) / (r_(k+1) - r_k) tends to 4.669...; it is None where a
+# neighbouring onset is missing.
+def period_doubling_table(growth_rates, periods):
+    onsets = []
+    period = 2
+    while True:
+        found = np.nonzero(periods == period)[0]
+        if found.size == 0 or (onsets and growth_rates[found[0]] <= onsets[-1][1]):
+            break
+        onsets.append((period, float(growth_rates[found[0]])))
+        period *= 2
+
+    table = []
+    for k, (period, onset) in enumerate(onsets):
+        ratio = None
+        if 0 < k < len(onsets) - 1:
+            ratio = (onset - onsets[k - 1][1]) / (onsets[k + 1][1] - onset)
+        table.append((period, onset, ratio))
+    return table
+
+
+# Periodic windows inside the chaotic region: stretches of periodic orbits
+# between chaotic stretches after the end of the main period-doubling cascade,
+# as (period at the window's start, first r, last r) tuples. Orbits near a
+# window's own bifurcation points may stay unresolved and split it in two.
+def period_windows(growth_rates, periods, min_width=1):
+    cascade = period_doubling_table(growth_rates, periods)
+    if not cascade:
+        return []
+    chaotic = np.nonzero((periods == 0) & (growth_rates > cascade[-1][1]))[0]
+    if chaotic.size == 0:
+        return []
+
+    windows = []
+    periodic = periods[chaotic[0]:] > 0
+    edges = np.diff(np.concatenate(([False], periodic, [False])).astype(np.int8))
+    for start, stop in zip(np.nonzero(edges == 1)[0], np.nonzero(edges == -1)[0]):
+        if stop - start >= min_width:
+            first, last = chaotic[0] + start, chaotic[0] + stop - 1
+            windows.append((int(periods[first]), float(growth_rates[first]), float(growth_rates[last])))
+    return windows
@@ -0,0 +1,86 @@
+import threading
+import traceback
+
+
+# Raised inside a job function when it notices it has been superseded
+class JobCancelled(Exception):
+    pass
+
+
+# Runs a function on a single background thread where the latest request wins:
+# submitting a new value marks any queued or in-flight job as stale, stale jobs
+# are cancelled at their next check and their results are dropped.
+class LatestJobRunner:
+    def __init__(self, function):
+        self._function = function
+        self._condition = threading.Condition()
+        self._latest_id = 0
+        self._pending = None  # (job_id, value) waiting to start
+        self._running_id = None
+        self._result = None  # (job_id, value, result) not yet collected
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # Queue a new job, superseding everything submitted before it
+    def submit(self, value):
+        with self._condition:
+            self._latest_id += 1
+            self._pending = (self._latest_id, value)
+            self._condition.notify()
+            return self._latest_id
+
+    # True while the newest submitted job has not produced a result yet
+    @property
+    def busy(self):
+        with self._condition:
+            return self._pending is not None or self._running_id is not None
+
+    # Return (value, result) of the newest finished job once, or None
+    def poll(self):
+        with self._condition:
+            finished, self._result = self._result, None
+        if finished is None:
+            return None
+        _, value, result = finished
+        return value, result
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._pending = None
+            self._latest_id += 1  # Makes any running job stale
+            self._condition.notify()
+        self._thread.join()
+
+    def _is_stale(self, job_id):
+        return job_id != self._latest_id
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                job_id, value = self._pending
+                self._pending = None
+                self._running_id = job_id
+
+            def cancelled():
+                return self._is_stale(job_id)
+
+            succeeded = False
+            try:
+                result = self._function(value, cancelled)
+                succeeded = True
+            except JobCancelled:
+                pass
+            except Exception:
+                # Keep the worker alive; the UI keeps showing the last good result
+                traceback.print_exc()
+
+            with self._condition:
+                self._running_id = None
+                if succeeded and not self._is_stale(job_id):
+                    self._result = (job_id, value, result)
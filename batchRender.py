@@ -0,0 +1,171 @@
+import argparse
+import os
+import sys
+import time
+
+# Batch renders from the command line, without a display:
+#   python batchRender.py bifurcation logistic_{x0}.png --initial-population 0.2 0.4 0.6
+#   python batchRender.py mandelbrot mandelbrot.png --size 4000 4000 --max-iter 1000
+#   python batchRender.py grid2png mandelbrot_data.grid mandelbrot.png --colormap hot
+#   python batchRender.py zoom frames/frame_{:05d}.png --center -0.7436438870 0.1318259042 --frames 600
+# The output format follows the extension: .png writes an image, .lmap (bifurcation)
+# the raw samples as an array file and .grid (mandelbrot) the iteration counts.
+# Mandelbrot PNGs are streamed band by band, so posters of any size fit in memory.
+# Only argparse is imported up front; NumPy and the compute core are loaded once
+# the arguments are known, so --help and argument errors return immediately.
+
+
+def _elapsed(start):
+    return f"{time.perf_counter() - start:.2f} s"
+
+
+def _check_extension(parser, filename, allowed):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in allowed:
+        parser.error(f"{filename}: unsupported output type {extension or '(none)'}, use one of {', '.join(allowed)}")
+    return extension
+
+
+def render_bifurcation(args, parser):
+    extension = _check_extension(parser, args.output, (".png", ".lmap"))
+    if len(args.initial_population) > 1 and "{x0}" not in args.output:
+        parser.error("several initial populations need an output name containing {x0}")
+
+    from chaosCore import bifurcation_raster, growth_rate_grid
+
+    for x0 in args.initial_population:
+        start = time.perf_counter()
+        filename = args.output.format(x0=x0)
+        if extension == ".png":
+            raster = bifurcation_raster(args.size[0], args.size[1], x0, args.growth_rates[0], args.growth_rates[1],
+                                        args.resolution, args.transient, args.samples)
+            raster.save_png(filename, ink=(0, 0, 255), mode=args.tone)
+        else:
+            from bifurcationExport import export_bifurcation
+
+            growth_rates = growth_rate_grid(args.growth_rates[0], args.growth_rates[1], args.resolution)
+            export_bifurcation(filename, growth_rates, x0, args.resolution, args.transient, args.samples)
+        print(f"{filename} written in {_elapsed(start)}")
+
+
+def render_mandelbrot(args, parser):
+    extension = _check_extension(parser, args.output, (".png", ".grid"))
+
+    import numpy as np
+
+    start = time.perf_counter()
+    width, height = args.size
+    complex_dtype = np.complex64 if args.precision == "single" else np.complex128
+    if extension == ".png":
+        from posterRender import render_poster
+
+        render_poster(args.output, *args.bounds, width, height, args.max_iter, args.colormap,
+                      int(args.band_mb * 2**20), complex_dtype=complex_dtype, workers=args.workers,
+                      grid_filename=args.grid)
+    else:
+        from chaosCore import mandelbrot_grid
+        from gridFile import save_grid
+
+        counts = mandelbrot_grid(*args.bounds, width, height, args.max_iter, complex_dtype=complex_dtype,
+                                 workers=args.workers)
+        save_grid(args.output, counts, args.bounds, args.max_iter)
+    print(f"{args.output} written in {_elapsed(start)}")
+
+
+def convert_grid(args, parser):
+    _check_extension(parser, args.output, (".png",))
+
+    from posterRender import grid_to_png
+
+    start = time.perf_counter()
+    grid_to_png(args.grid, args.output, args.colormap, int(args.band_mb * 2**20))
+    print(f"{args.output} written in {_elapsed(start)}")
+
+
+def render_zoom(args, parser):
+    _check_extension(parser, args.output.format(0), (".png",))
+
+    from zoomSequence import ZoomSequence, export_zoom_sequence
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    def report(done, total):
+        print(f"{done} / {total} frames", end="\r" if done < total else "\n")
+
+    sequence = ZoomSequence(args.center[0], args.center[1], args.frames, args.zoom_rate, args.size[0], args.size[1],
+                            args.max_iter, args.start_width)
+    stats = export_zoom_sequence(sequence, args.output, args.colormap, args.workers, args.queue_size,
+                                 args.encoders, report)
+    print(f"{stats['frames']} frames written in {stats['seconds']:.2f} s, "
+          f"{stats['computed_points']} points computed instead of {stats['direct_points']}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Render bifurcation diagrams and Mandelbrot grids to files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bifurcation = commands.add_parser("bifurcation", help="logistic map bifurcation diagram (.png or .lmap)")
+    bifurcation.add_argument("output", help="output file; {x0} is replaced by the initial population")
+    bifurcation.add_argument("--initial-population", type=float, nargs="+", default=[0.4],
+                             help="initial population(s), one output each")
+    bifurcation.add_argument("--growth-rates", type=float, nargs=2, default=(0.0, 4.0), metavar=("MIN", "MAX"))
+    bifurcation.add_argument("--resolution", type=float, default=0.001, help="growth rate step")
+    bifurcation.add_argument("--transient", type=int, default=50, help="generations discarded per growth rate")
+    bifurcation.add_argument("--samples", type=int, default=100, help="generations kept per growth rate")
+    bifurcation.add_argument("--size", type=int, nargs=2, default=(3600, 2400), metavar=("WIDTH", "HEIGHT"),
+                             help="image size in pixels")
+    bifurcation.add_argument("--tone", choices=("log", "gamma", "linear"), default="log", help="density tone mapping")
+    bifurcation.set_defaults(render=render_bifurcation)
+
+    mandelbrot = commands.add_parser("mandelbrot", help="Mandelbrot escape-time grid (.png or .grid)")
+    mandelbrot.add_argument("output", help="output file")
+    mandelbrot.add_argument("--bounds", type=float, nargs=4, default=(-2.5, 1.5, -2.0, 2.0),
+                            metavar=("X_MIN", "X_MAX", "Y_MIN", "Y_MAX"))
+    mandelbrot.add_argument("--size", type=int, nargs=2, default=(2000, 2000), metavar=("WIDTH", "HEIGHT"))
+    mandelbrot.add_argument("--max-iter", type=int, default=256)
+    mandelbrot.add_argument("--precision", choices=("single", "double"), default="double",
+                            help="complex64 or complex128 arithmetic")
+    mandelbrot.add_argument("--workers", type=int, help="worker processes (default: all cores, 1: in-process)")
+    mandelbrot.add_argument("--colormap", default="bands",
+                            help="'bands' (the zoom viewer's palette) or a matplotlib colormap name")
+    mandelbrot.add_argument("--band-mb", type=float, default=64, help="memory per band of a streamed PNG")
+    mandelbrot.add_argument("--grid", help="also keep the counts of a PNG render in this .grid file")
+    mandelbrot.set_defaults(render=render_mandelbrot)
+
+    convert = commands.add_parser("grid2png", help="stream a .grid file to a PNG without loading it")
+    convert.add_argument("grid", help="input .grid file")
+    convert.add_argument("output", help="output .png file")
+    convert.add_argument("--colormap", default="hot",
+                         help="'bands' (the zoom viewer's palette) or a matplotlib colormap name")
+    convert.add_argument("--band-mb", type=float, default=64, help="memory per band")
+    convert.set_defaults(render=convert_grid)
+
+    zoom = commands.add_parser("zoom", help="Mandelbrot zoom sequence, one PNG per frame")
+    zoom.add_argument("output", help="frame file pattern, e.g. frames/frame_{:05d}.png")
+    zoom.add_argument("--center", nargs=2, required=True, metavar=("RE", "IM"),
+                      help="target point; decimal strings keep their full precision for deep zooms")
+    zoom.add_argument("--zoom-rate", type=float, default=1.05, help="magnification from one frame to the next")
+    zoom.add_argument("--frames", type=int, default=600)
+    zoom.add_argument("--size", type=int, nargs=2, default=(800, 600), metavar=("WIDTH", "HEIGHT"))
+    zoom.add_argument("--start-width", type=float, default=4.0, help="width of the first frame in the complex plane")
+    zoom.add_argument("--max-iter", type=int, default=256)
+    zoom.add_argument("--colormap", default="bands",
+                      help="'bands' (the zoom viewer's palette) or a matplotlib colormap name")
+    zoom.add_argument("--workers", type=int, help="worker processes (default: all cores, 1: in-process)")
+    zoom.add_argument("--encoders", type=int, default=2, help="PNG encoder threads")
+    zoom.add_argument("--queue-size", type=int, default=8, help="frames buffered between pipeline stages")
+    zoom.set_defaults(render=render_zoom)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    args.render(args, parser)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Never open a window or a GUI backend, even when a kernel lives in a GUI module
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import numpy as np
+
+# Headless benchmarks of the project's compute kernels. Every kernel runs at
+# several problem sizes; each case reports the best wall time of `repeats`
+# runs, throughput in the kernel's own unit, and peak traced memory (from one
+# extra run under tracemalloc, which NumPy reports its buffers to). Results go
+# to JSON and can be compared against a stored baseline run.
+DEFAULT_REPEATS = 3
+DEFAULT_THRESHOLD = 0.10  # Fractional throughput loss that counts as a regression
+
+
+# Complex grid with the same layout as mandelbrot.py
+def _complex_grid(width, height):
+    x = np.linspace(-2.5, 1.5, width)
+    y = np.linspace(-2.0, 2.0, height)
+    return x[np.newaxis, :] + 1j * y[:, np.newaxis]
+
+
+# Each setup function takes one size dict and returns (run, work, unit):
+# run() executes the kernel once, work is the amount it processes per run
+
+def setup_scalar_mandelbrot(size):
+    from escapeTime import escape_time_point
+
+    points = _complex_grid(size["width"], size["height"]).ravel().tolist()
+    max_iter = size["max_iter"]
+
+    def run():
+        for c in points:
+            escape_time_point(c, max_iter)
+    return run, len(points), "pixels/s"
+
+
+def setup_numpy_mandelbrot(size):
+    from mandelbrot import mandelbrot
+
+    c = _complex_grid(size["width"], size["height"])
+    return lambda: mandelbrot(c, size["max_iter"]), c.size, "pixels/s"
+
+
+def setup_bifurcation(size):
+    from logisticMap import DEFAULT_SAMPLES, DEFAULT_TRANSIENT, bifurcation, growth_rate_grid
+
+    growth_rates = growth_rate_grid(0, 4, size["resolution"])
+    run = lambda: bifurcation(growth_rates, 0.4, DEFAULT_TRANSIENT, DEFAULT_SAMPLES)
+    return run, growth_rates.size * DEFAULT_SAMPLES, "samples/s"
+
+
+def setup_trajectory(size):
+    from logisticMap import trajectory
+
+    return lambda: trajectory(0.4, 3.7, size["generations"]), size["generations"], "samples/s"
+
+
+# Text grid loading as pipelineForTestc.py does it: the C renderer's text
+# output converted to a binary grid file
+def setup_text_grid_import(size):
+    from gridFile import import_text_grid
+
+    directory = tempfile.mkdtemp(prefix="benchmark_")
+    atexit.register(shutil.rmtree, directory, True)
+    text_filename = os.path.join(directory, "mandelbrot_data.txt")
+    grid_filename = os.path.join(directory, "mandelbrot_data.grid")
+    counts = np.random.default_rng(0).integers(0, size["height"] // 5, (size["height"], size["width"]))
+    np.savetxt(text_filename, counts, fmt="%d")
+    megabytes = os.path.getsize(text_filename) / 2**20
+    run = lambda: import_text_grid(text_filename, grid_filename, (-2.0, 1.0, -1.5, 1.5))
+    return run, megabytes, "MB/s"
+
+
+# kernel name -> (setup function, problem sizes from small to large)
+KERNELS = {
+    "scalar_mandelbrot": (setup_scalar_mandelbrot, [
+        {"width": 64, "height": 64, "max_iter": 64},
+        {"width": 128, "height": 128, "max_iter": 256},
+        {"width": 256, "height": 256, "max_iter": 1000},
+    ]),
+    "numpy_mandelbrot": (setup_numpy_mandelbrot, [
+        {"width": 256, "height": 256, "max_iter": 256},
+        {"width": 1024, "height": 1024, "max_iter": 256},
+        {"width": 1024, "height": 1024, "max_iter": 1000},
+    ]),
+    "bifurcation": (setup_bifurcation, [
+        {"resolution": 0.01},
+        {"resolution": 0.001},
+        {"resolution": 0.0001},
+    ]),
+    "trajectory": (setup_trajectory, [
+        {"generations": 1000},
+        {"generations": 100000},
+        {"generations": 1000000},
+    ]),
+    "text_grid_import": (setup_text_grid_import, [
+        {"width": 500, "height": 500},
+        {"width": 2000, "height": 2000},
+    ]),
+}
+
+
+# Stable label of one case, used to match results against a baseline
+def case_label(kernel, size):
+    return kernel + "[" + ",".join(f"{key}={value}" for key, value in size.items()) + "]"
+
+
+# Run one case and return its result record
+def run_case(kernel, size, repeats=DEFAULT_REPEATS, measure_memory=True):
+    setup = KERNELS[kernel][0]
+    run, work, unit = setup(size)
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+
+    peak = None
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "label": case_label(kernel, size),
+        "kernel": kernel,
+        "size": size,
+        "seconds": best,
+        "seconds_all": times,
+        "work": work,
+        "throughput": work / best if best > 0 else float("inf"),
+        "unit": unit,
+        "peak_memory_bytes": peak,
+    }
+
+
+# Run the selected kernels (all by default); quick=True keeps only the smallest size
+def run_benchmarks(kernels=None, repeats=DEFAULT_REPEATS, quick=False, measure_memory=True, report=print):
+    results = []
+    for kernel in kernels or KERNELS:
+        sizes = KERNELS[kernel][1][:1] if quick else KERNELS[kernel][1]
+        for size in sizes:
+            result = run_case(kernel, size, repeats, measure_memory)
+            if report is not None:
+                report(format_result(result))
+            results.append(result)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeats": repeats,
+        },
+        "results": results,
+    }
+
+
+def format_result(result):
+    memory = ""
+    if result["peak_memory_bytes"] is not None:
+        memory = f"  peak {result['peak_memory_bytes'] / 2**20:8.1f} MB"
+    return (f"{result['label']:<60} {result['seconds']:9.4f} s  "
+            f"{result['throughput']:12.4g} {result['unit']}{memory}")
+
+
+# Compare a run against a baseline run. Returns (rows, regressions) where rows
+# are (label, baseline throughput, current throughput, ratio) for every case in
+# both runs and regressions are the rows whose ratio falls below 1 - threshold
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    baseline_by_label = {result["label"]: result for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        previous = baseline_by_label.get(result["label"])
+        if previous is None or not previous["throughput"]:
+            continue
+        rows.append((result["label"], previous["throughput"], result["throughput"],
+                     result["throughput"] / previous["throughput"]))
+    regressions = [row for row in rows if row[3] < 1.0 - threshold]
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmarks of the compute kernels.")
+    parser.add_argument("--kernels", nargs="+", choices=sorted(KERNELS), help="kernels to run (default: all)")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="timed runs per case (best is kept)")
+    parser.add_argument("--quick", action="store_true", help="run only the smallest size of each kernel")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory run")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file for the results")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="throughput loss (fraction) that counts as a regression")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.kernels, args.repeats, args.quick, not args.no_memory)
+    with open(args.output, "w") as file:
+        json.dump(current, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        rows, regressions = compare(current, baseline, args.threshold)
+        print(f"\nCompared with {args.baseline} (regression threshold {args.threshold:.0%}):")
+        for label, before, after, ratio in rows:
+            flag = "  REGRESSION" if ratio < 1.0 - args.threshold else ""
+            print(f"{label:<60} {before:12.4g} -> {after:12.4g}  x{ratio:.2f}{flag}")
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
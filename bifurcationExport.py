@@ -0,0 +1,56 @@
+import numpy as np
+
+from arrayFile import create_array_file, open_array_file
+from logisticMap import DEFAULT_SAMPLES, DEFAULT_TRANSIENT, bifurcation_chunks
+
+COLUMNS = ("growth_rate", "population")
+
+
+# Run the bifurcation sweep chunk by chunk and write the columns straight to a
+# memory-mappable array file (shape (2, rows), one contiguous row per column).
+# A CSV copy is written alongside, also chunk by chunk, when csv_filename is given.
+def export_bifurcation(filename, growth_rates, initial_population, resolution,
+                       transient=DEFAULT_TRANSIENT, samples=DEFAULT_SAMPLES,
+                       dtype=np.float32, chunk_size=65536, csv_filename=None):
+    growth_rates = np.asarray(growth_rates, dtype=np.float64)
+    rows = growth_rates.size * samples
+    metadata = {
+        "columns": list(COLUMNS),
+        "resolution": resolution,
+        "transient": transient,
+        "samples": samples,
+        "initial_population": initial_population,
+        "min_growth_rate": float(growth_rates[0]) if growth_rates.size else None,
+        "max_growth_rate": float(growth_rates[-1]) if growth_rates.size else None,
+    }
+    columns = create_array_file(filename, (len(COLUMNS), rows), dtype, metadata)
+
+    csv_file = None
+    if csv_filename is not None:
+        csv_file = open(csv_filename, "w")
+        csv_file.write("Growth Rate,Population\n")
+
+    try:
+        offset = 0
+        # The sweep itself runs in float64; only the stored columns are narrowed
+        for rates, populations in bifurcation_chunks(growth_rates, initial_population, transient,
+                                                     samples, chunk_size=chunk_size):
+            columns[0, offset:offset + rates.size] = rates
+            columns[1, offset:offset + rates.size] = populations
+            offset += rates.size
+            if csv_file is not None:
+                np.savetxt(csv_file, np.column_stack((rates, populations)), fmt="%.17g", delimiter=",")
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+
+    if isinstance(columns, np.memmap):
+        columns.flush()
+    return metadata
+
+
+# Open an exported sweep without reading it into memory, returning
+# (growth_rates, populations, metadata) where both columns are memory-mapped views
+def load_bifurcation(filename):
+    columns, metadata = open_array_file(filename)
+    return columns[0], columns[1], metadata
@@ -0,0 +1,61 @@
+import numpy as np
+
+from densityRaster import DensityRaster
+from escapeTime import escape_time, escape_time_point, in_cardioid_or_bulb, pixel_grid
+from gridFile import count_dtype
+from logisticMap import (DEFAULT_SAMPLES, DEFAULT_TRANSIENT, bifurcation, bifurcation_chunks, bifurcation_samples,
+                         envelope_bounds, growth_rate_grid, logistic_step, trajectory, trajectory_envelope)
+
+# Headless compute core: the logistic map (trajectory, bifurcation sweep) and
+# the escape-time kernels, plus helpers that turn them into finished grids and
+# images. It depends on NumPy only and never imports pygame or matplotlib, so
+# render servers and batch jobs can use it without a display; the process pool
+# is only imported when a render actually uses it.
+__all__ = [
+    "DEFAULT_SAMPLES", "DEFAULT_TRANSIENT", "DensityRaster", "bifurcation", "bifurcation_chunks",
+    "bifurcation_raster", "bifurcation_samples", "build_palette", "envelope_bounds", "escape_time",
+    "escape_time_point", "growth_rate_grid", "in_cardioid_or_bulb", "logistic_step", "mandelbrot_grid", "pixel_grid",
+    "trajectory", "trajectory_envelope",
+]
+
+
+# Precompute the basic coloring for every possible iteration count
+def build_palette(max_iter):
+    m = np.arange(max_iter + 1)
+    return np.stack((m % 8 * 32, m % 16 * 16, m % 32 * 8), axis=-1).astype(np.uint8)
+
+
+# Escape-time counts of a (height, width) grid, rows along the imaginary axis,
+# sampled like parallelRender.grid_axes. workers=1 renders in this process;
+# anything else uses a process pool with that many workers (None = all cores)
+def mandelbrot_grid(x_min, x_max, y_min, y_max, width, height, max_iter, endpoint=False,
+                    complex_dtype=np.complex128, workers=None, progress=None):
+    if workers == 1:
+        from parallelRender import grid_axes
+
+        re, im = grid_axes(x_min, x_max, y_min, y_max, width, height, endpoint)
+        c = re[np.newaxis, :] + 1j * im[:, np.newaxis]
+        return escape_time(c, max_iter, dtype=complex_dtype, progress=progress).astype(count_dtype(max_iter))
+
+    from parallelRender import render_parallel
+
+    return render_parallel(x_min, x_max, y_min, y_max, width, height, max_iter, workers, endpoint=endpoint,
+                           out_dtype=count_dtype(max_iter), complex_dtype=complex_dtype, progress=progress)
+
+
+# Bifurcation diagram of one initial population binned into a width x height
+# density raster over [min_growth_rate, max_growth_rate) x [0, 1], streaming
+# the sweep chunk by chunk so memory stays bounded by chunk_size
+def bifurcation_raster(width, height, initial_population, min_growth_rate=0.0, max_growth_rate=4.0,
+                       resolution=0.001, transient=DEFAULT_TRANSIENT, samples=DEFAULT_SAMPLES,
+                       chunk_size=65536, progress=None):
+    raster = DensityRaster(width, height, (min_growth_rate, max_growth_rate), (0, 1))
+    growth_rates = growth_rate_grid(min_growth_rate, max_growth_rate, resolution)
+    done = 0
+    for rates, populations in bifurcation_chunks(growth_rates, initial_population, transient, samples,
+                                                 chunk_size=chunk_size):
+        raster.add(rates, populations)
+        done += rates.size // samples
+        if progress is not None:
+            progress(done, growth_rates.size)
+    return raster
@@ -0,0 +1,84 @@
+import numpy as np
+
+from pngWriter import write_png
+
+
+# Fixed-size 2D hit-count histogram for bifurcation samples. Samples are binned
+# as they arrive (chunk by chunk if needed), so the cost of drawing grows with
+# the image size instead of the number of points.
+class DensityRaster:
+    def __init__(self, width, height, x_range, y_range):
+        self.width = width
+        self.height = height
+        self.x_min, self.x_max = x_range
+        self.y_min, self.y_max = y_range
+        # Row 0 is the top of the image (largest y), like any pixel buffer
+        self.counts = np.zeros((height, width), dtype=np.uint32)
+
+    @property
+    def extent(self):
+        return (self.x_min, self.x_max, self.y_min, self.y_max)
+
+    def clear(self):
+        self.counts.fill(0)
+
+    # Bin a batch of (x, y) samples into the histogram; `weights` counts a sample
+    # as that many hits (e.g. one stored cycle point standing for many generations)
+    def add(self, x, y, weights=None):
+        x = np.asarray(x, dtype=np.float64).ravel()
+        y = np.asarray(y, dtype=np.float64).ravel()
+        columns = np.floor((x - self.x_min) * (self.width / (self.x_max - self.x_min)))
+        rows = np.floor((self.y_max - y) * (self.height / (self.y_max - self.y_min)))
+        # The right/top edges belong to the last bin; everything else outside is dropped
+        columns[x == self.x_max] = self.width - 1
+        rows[y == self.y_max] = 0
+        inside = (columns >= 0) & (columns < self.width) & (rows >= 0) & (rows < self.height)
+        flat = rows[inside].astype(np.intp) * self.width + columns[inside].astype(np.intp)
+        if weights is None:
+            hits = np.bincount(flat, minlength=self.width * self.height)
+        else:
+            weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), x.shape)[inside]
+            hits = np.rint(np.bincount(flat, weights=weights, minlength=self.width * self.height))
+        self.counts += hits.reshape(self.height, self.width).astype(np.uint32)
+        return self
+
+    # Map hit counts to intensities in [0, 1] with log or gamma tone mapping.
+    # A fixed `peak` replaces the raster's own maximum, so rasters rendered
+    # separately (e.g. neighbouring tiles) share one scale
+    def intensity(self, mode="log", gamma=0.5, peak=None):
+        counts = self.counts.astype(np.float32)
+        if peak is None:
+            peak = counts.max()
+        else:
+            counts = np.minimum(counts, peak)
+        if peak == 0:
+            return counts
+        if mode == "log":
+            return np.log1p(counts) / np.log1p(peak)
+        if mode == "gamma":
+            return (counts / peak) ** gamma
+        if mode == "linear":
+            return counts / peak
+        raise ValueError(f"Unknown tone mapping mode: {mode}")
+
+    # Blend the tone-mapped intensities from background to ink as an RGB uint8 image
+    def to_rgb(self, ink=(0, 0, 255), background=(255, 255, 255), mode="log", gamma=0.5, out=None, peak=None):
+        level = self.intensity(mode, gamma, peak)[..., np.newaxis]
+        ink = np.asarray(ink, dtype=np.float32)
+        background = np.asarray(background, dtype=np.float32)
+        rgb = background + level * (ink - background)
+        if out is None:
+            out = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        np.clip(rgb + 0.5, 0, 255, out=rgb)
+        out[...] = rgb
+        return out
+
+    # Write the raster straight to a PNG (no axes), one pixel per bin
+    def save_png(self, filename, **tone):
+        write_png(filename, self.to_rgb(**tone))
+
+    # Draw the raster on a matplotlib axes as a single embedded image, so
+    # vector outputs (PDF/SVG) hold one bitmap instead of one object per point
+    def draw(self, ax, **tone):
+        return ax.imshow(self.to_rgb(**tone), extent=self.extent, aspect="auto",
+                         interpolation="nearest", origin="upper")
@@ -0,0 +1,131 @@
+import numpy as np
+
+
+DEFAULT_CHUNK_SIZE = 1 << 18
+
+
+# True for points inside the main cardioid or the period-2 bulb, which never
+# escape and can be reported as max_iter without iterating
+def in_cardioid_or_bulb(re, im):
+    shifted = re - 0.25
+    im_squared = im * im
+    q = shifted * shifted + im_squared
+    cardioid = q * (q + shifted) <= 0.25 * im_squared
+    bulb = (re + 1.0) * (re + 1.0) + im_squared <= 0.0625
+    return cardioid | bulb
+
+
+# Escape-time iteration counts for a whole array of points c: the first n with
+# |z_n| > 2 (z_0 = 0), or max_iter if the orbit stays bounded, exactly like the
+# scalar escape_time_point() below and the C renderer.
+# Points are processed in chunks; within a chunk only the still-active points
+# are kept, as compact arrays of indices, z and c that shrink as points escape,
+# and the chunk stops as soon as none are left. `dtype` selects complex64 or
+# complex128 arithmetic and progress(done, total) is called after each chunk.
+# Interior points are short-circuited: the main cardioid and period-2 bulb are
+# classified analytically, and orbits that return to within the periodicity
+# tolerance of a saved z (saved at iterations 1, 2, 4, 8, ... as in Brent's
+# cycle detection) are stopped early and still reported as max_iter. The
+# default tolerance of 0 only accepts exact returns, which can never escape in
+# the working precision, so the output is identical to plain iteration; a
+# small positive squared distance stops converging orbits even sooner.
+def escape_time(c, max_iter, dtype=np.complex128, chunk_size=DEFAULT_CHUNK_SIZE, progress=None,
+                interior_checks=True, periodicity_tolerance=0.0):
+    c = np.asarray(c)
+    flat_c = c.ravel()
+    counts = np.full(flat_c.size, max_iter, dtype=np.int32)
+    real_dtype = np.finfo(dtype).dtype
+
+    for start in range(0, flat_c.size, chunk_size):
+        stop = min(start + chunk_size, flat_c.size)
+        index = np.arange(start, stop)
+        points = flat_c[start:stop].astype(dtype)
+        if interior_checks:
+            outside = ~in_cardioid_or_bulb(points.real, points.imag)
+            index, points = index[outside], points[outside]
+        z = np.zeros_like(points)
+        saved = np.zeros_like(points)
+        magnitude = np.empty(points.size, dtype=real_dtype)
+        scratch = np.empty(points.size, dtype=real_dtype)
+        next_save = 1
+
+        for n in range(max_iter):
+            if index.size == 0:
+                break
+
+            # |z|^2 > 4, without the square root
+            np.multiply(z.real, z.real, out=magnitude)
+            np.multiply(z.imag, z.imag, out=scratch)
+            magnitude += scratch
+            finished = magnitude > 4.0
+            any_finished = finished.any()
+            if any_finished:
+                counts[index[finished]] = n
+
+            if interior_checks and n > 1:
+                # |z - saved|^2 within tolerance: the orbit has settled into a cycle
+                difference = z - saved
+                np.multiply(difference.real, difference.real, out=magnitude)
+                np.multiply(difference.imag, difference.imag, out=scratch)
+                magnitude += scratch
+                periodic = magnitude <= periodicity_tolerance
+                if any_finished:
+                    periodic &= ~finished
+                if periodic.any():
+                    finished |= periodic
+                    any_finished = True
+
+            if any_finished:
+                active = ~finished
+                index, points, z, saved = index[active], points[active], z[active], saved[active]
+                magnitude = magnitude[:index.size]
+                scratch = scratch[:index.size]
+                if index.size == 0:
+                    break
+
+            if interior_checks and n == next_save:
+                saved[...] = z
+                next_save *= 2
+
+            # z <- z^2 + c, in place
+            np.multiply(z, z, out=z)
+            z += points
+
+        if progress is not None:
+            progress(stop, flat_c.size)
+
+    return counts.reshape(c.shape)
+
+
+# Escape-time count of a single point c with plain Python complex arithmetic
+# (the scalar reference for escape_time, with the same interior checks)
+def escape_time_point(c, max_iter):
+    # Points in the main cardioid or the period-2 bulb never escape
+    if in_cardioid_or_bulb(c.real, c.imag):
+        return max_iter
+
+    z = 0
+    saved = 0
+    next_save = 1
+    for n in range(max_iter):
+        if abs(z) > 2:
+            return n
+        # An orbit that returns exactly to a saved value is periodic (Brent-style check)
+        if n > 1 and z == saved:
+            return max_iter
+        if n == next_save:
+            saved = z
+            next_save *= 2
+        z = z*z + c
+    return max_iter
+
+
+# Complex sample points of a pixel grid; pixel (x, y) maps to
+# x_min + x / width * (x_max - x_min) and likewise for y, as in the original zoom renderer
+def pixel_grid(x_min, x_max, y_min, y_max, width, height, x0=0, y0=0, tile_width=None, tile_height=None):
+    tile_width = width if tile_width is None else tile_width
+    tile_height = height if tile_height is None else tile_height
+    re = x_min + (np.arange(x0, x0 + tile_width) / width) * (x_max - x_min)
+    im = y_min + (np.arange(y0, y0 + tile_height) / height) * (y_max - y_min)
+    # Indexed [x, y] to match pygame's surfarray layout
+    return re[:, np.newaxis] + 1j * im[np.newaxis, :]
@@ -1,8 +1,9 @@
+import time
 import pygame
 import numpy as np
-
-# Initialize Pygame
-pygame.init()
+from logisticMap import trajectory, trajectory_envelope
+from instrumentation import Instrumentation, ThroughputEta
+from backgroundJob import JobCancelled, LatestJobRunner
 
 # Constants for the window size and colors
 WIDTH, HEIGHT = 1280, 1024
@@ -10,7 +11,12 @@ DARK_GRAY = (40, 40, 40)
 WHITE = (255, 255, 255)
 LIGHT_GRAY = (200, 200, 200)
 BLACK = (0, 0, 0)
-FONT = pygame.font.SysFont("Arial", 24)
+FONT = None  # Created by main() once pygame is initialized
+SHOW_TIMINGS = False  # Timing overlay, toggled with F3
+TIMING_TRACE = None  # e.g. 'generation_timings.csv' for a per-frame CSV trace
+LONG_RUN = False  # Start in the long-run mode (toggled with the "Long run" button)
+PROGRESS_INTERVAL = 100  # Milliseconds between redraws while a long run is computed
+LANE_COLORS = [(255, 170, 60), (90, 190, 255), (140, 220, 120), (230, 120, 200)]
 
 # Universal metrics
 class Metrics:
@@ -26,13 +32,21 @@ class Metrics:
     GENERATION_COUNT_MAX = 500
     GENERATION_COUNT_DEFAULT = 100
 
+    # Long-run mode: the generation slider picks log10 of the generation count,
+    # and the trajectories of slightly shifted initial populations are stacked
+    LONG_GENERATION_EXPONENT_MIN = 3
+    LONG_GENERATION_EXPONENT_MAX = 8
+    LONG_GENERATION_EXPONENT_DEFAULT = 6
+    INITIAL_POPULATION_OFFSETS = (0.0, 1e-9, 1e-6, 1e-3)
+
 # Slider class
 class Slider:
-    def __init__(self, x, y, width, min_value, max_value, initial_value):
+    def __init__(self, x, y, width, min_value, max_value, initial_value, format_value=None):
         self.rect = pygame.Rect(x, y, width, 20)
         self.min_value = min_value
         self.max_value = max_value
         self.value = initial_value
+        self.format_value = format_value or (lambda value: f"{value:.2f}")
 
     def draw(self, screen):
         pygame.draw.rect(screen, LIGHT_GRAY, self.rect, 2)
@@ -40,13 +54,19 @@ class Slider:
         pygame.draw.circle(screen, LIGHT_GRAY, (int(handle_x), self.rect.y + 10), 10)
         
         # Draw value label
-        label = FONT.render(f"{self.value:.2f}", True, LIGHT_GRAY)
+        label = FONT.render(self.format_value(self.value), True, LIGHT_GRAY)
         screen.blit(label, (self.rect.x + self.rect.width + 10, self.rect.y))
 
     def update(self, mouse_pos):
         if self.rect.collidepoint(mouse_pos):
-            self.value = (mouse_pos[0] - self.rect.x) / self.rect.width * (self.max_value - self.min_value) + self.min_value
-            self.value = max(self.min_value, min(self.value, self.max_value))
+            self.drag(mouse_pos[0])
+            return True
+        return False
+
+    # Follow the mouse while the slider is held, even outside its rectangle
+    def drag(self, mouse_x):
+        self.value = (mouse_x - self.rect.x) / self.rect.width * (self.max_value - self.min_value) + self.min_value
+        self.value = max(self.min_value, min(self.value, self.max_value))
 
 # Button class
 class Button:
@@ -63,59 +83,173 @@ class Button:
     def is_clicked(self, mouse_pos):
         return self.rect.collidepoint(mouse_pos)
 
-# Function to draw the population growth graph
-def draw_graph(screen, populations_this_year, populations_next_year, generation_count):
-    graph_width = WIDTH - 200
-    graph_height = HEIGHT - 250
-    start_x = 100
-    start_y = 100
+# Graph geometry
+GRAPH_WIDTH = WIDTH - 200
+GRAPH_HEIGHT = HEIGHT - 250
+GRAPH_X = 100
+GRAPH_Y = 100
+POINT_RADIUS = 5
+
+# Pre-render the static axes/grid/label layer for a given y-range and generation
+# count; with panel_labels the graph is split into one stacked panel per label
+def create_graph_layer(min_population, max_population, generation_count, panel_labels=()):
+    layer = pygame.Surface((WIDTH, HEIGHT))
+    layer.fill(DARK_GRAY)
+    graph_width, graph_height = GRAPH_WIDTH, GRAPH_HEIGHT
+    start_x, start_y = GRAPH_X, GRAPH_Y
 
     # Draw the axes
-    pygame.draw.line(screen, LIGHT_GRAY, (start_x, start_y + graph_height), (start_x + graph_width, start_y + graph_height), 2)  # X-axis
-    pygame.draw.line(screen, LIGHT_GRAY, (start_x, start_y), (start_x, start_y + graph_height), 2)  # Y-axis
+    pygame.draw.line(layer, LIGHT_GRAY, (start_x, start_y + graph_height), (start_x + graph_width, start_y + graph_height), 2)  # X-axis
+    pygame.draw.line(layer, LIGHT_GRAY, (start_x, start_y), (start_x, start_y + graph_height), 2)  # Y-axis
 
     # Draw labels for axes
     x_label = FONT.render("Generation", True, LIGHT_GRAY)
     y_label = FONT.render("Population", True, LIGHT_GRAY)
-    screen.blit(x_label, (start_x + graph_width / 2 - x_label.get_width() / 2, start_y + graph_height + 10))
-    screen.blit(y_label, (start_x - 50, start_y + graph_height / 2 - y_label.get_height() / 2))
-
-    # Normalize population values for graphing
-    max_population = max(populations_next_year) if populations_next_year else 1
-    min_population = min(populations_next_year) if populations_next_year else 0
-
-    # Draw grid lines
-    for i in range(0, 11):
-        grid_y = start_y + graph_height - (i / 10) * graph_height
-        pygame.draw.line(screen, DARK_GRAY, (start_x, grid_y), (start_x + graph_width, grid_y), 1)
-        if max_population > 0:
-            grid_value = min_population + i / 10 * (max_population - min_population)
-            label = FONT.render(f"{grid_value:.2f}", True, LIGHT_GRAY)
-            screen.blit(label, (start_x - 50, grid_y - label.get_height() / 2))
+    layer.blit(x_label, (start_x + graph_width / 2 - x_label.get_width() / 2, start_y + graph_height + 10))
+    layer.blit(y_label, (start_x - 50, start_y + graph_height / 2 - y_label.get_height() / 2))
+
+    # Draw grid lines; stacked panels only label their inner lines so neighbours do not collide
+    panels = max(1, len(panel_labels))
+    divisions = 10 if panels == 1 else 4
+    panel_height = graph_height / panels
+    for panel in range(panels):
+        panel_bottom = start_y + (panel + 1) * panel_height
+        for i in range(0, divisions + 1):
+            grid_y = panel_bottom - (i / divisions) * panel_height
+            pygame.draw.line(layer, DARK_GRAY, (start_x, grid_y), (start_x + graph_width, grid_y), 1)
+            if max_population > 0 and (panels == 1 or 0 < i < divisions):
+                grid_value = min_population + i / divisions * (max_population - min_population)
+                label = FONT.render(f"{grid_value:.2f}", True, LIGHT_GRAY)
+                layer.blit(label, (start_x - 50, grid_y - label.get_height() / 2))
+        if panel_labels:
+            label = FONT.render(panel_labels[panel], True, LANE_COLORS[panel % len(LANE_COLORS)])
+            layer.blit(label, (start_x + 10, panel_bottom - panel_height + 5))
+            if panel > 0:
+                pygame.draw.line(layer, LIGHT_GRAY, (start_x, panel_bottom - panel_height),
+                                 (start_x + graph_width, panel_bottom - panel_height), 1)
 
     # Draw x-axis labels at generation*0.1 intervals
     for i in range(0, generation_count + 1, max(1, int(generation_count * 0.1))):
         grid_x = start_x + (i / generation_count) * graph_width
-        pygame.draw.line(screen, DARK_GRAY, (grid_x, start_y), (grid_x, start_y + graph_height), 1)
-        label = FONT.render(f"{i}", True, LIGHT_GRAY)
-        screen.blit(label, (grid_x - label.get_width() / 2, start_y + graph_height + 5))
-
-    # Draw the graph points
-    for i in range(len(populations_this_year)):
-        x = start_x + (i / (len(populations_this_year) - 1)) * graph_width
-        y = start_y + graph_height - (populations_next_year[i] - min_population) / (max_population - min_population) * graph_height
-        pygame.draw.circle(screen, LIGHT_GRAY, (int(x), int(y)), 5)
-
-    # Draw lines connecting the points
-    for i in range(len(populations_this_year) - 1):
-        x1 = start_x + (i / (len(populations_this_year) - 1)) * graph_width
-        y1 = start_y + graph_height - (populations_next_year[i] - min_population) / (max_population - min_population) * graph_height
-        x2 = start_x + ((i + 1) / (len(populations_this_year) - 1)) * graph_width
-        y2 = start_y + graph_height - (populations_next_year[i + 1] - min_population) / (max_population - min_population) * graph_height
-        pygame.draw.line(screen, LIGHT_GRAY, (int(x1), int(y1)), (int(x2), int(y2)), 2)
+        pygame.draw.line(layer, DARK_GRAY, (grid_x, start_y), (grid_x, start_y + graph_height), 1)
+        label = FONT.render(f"{i:,}", True, LIGHT_GRAY)
+        layer.blit(label, (grid_x - label.get_width() / 2, start_y + graph_height + 5))
+
+    return layer
+
+# Renders the population growth graph, caching the static layer and only
+# rebuilding it when the y-range or the generation count changes
+class GraphRenderer:
+    def __init__(self):
+        self.layer = None
+        self.layer_key = None
+        self.point = pygame.Surface((2 * POINT_RADIUS + 1, 2 * POINT_RADIUS + 1), pygame.SRCALPHA)
+        pygame.draw.circle(self.point, LIGHT_GRAY, (POINT_RADIUS, POINT_RADIUS), POINT_RADIUS)
+        self.points = []
+        self.line_points = []
+
+    # Rebuild the screen coordinates of the series after the populations changed
+    def update(self, populations_next_year, generation_count):
+        populations = np.asarray(populations_next_year, dtype=np.float64)
+
+        # Normalize population values for graphing
+        max_population = float(populations.max()) if populations.size else 1
+        min_population = float(populations.min()) if populations.size else 0
+        key = (min_population, max_population, generation_count)
+        if key != self.layer_key:
+            self.layer = create_graph_layer(min_population, max_population, generation_count)
+            self.layer_key = key
+
+        span = (max_population - min_population) or 1
+        xs = GRAPH_X + np.arange(populations.size) / max(populations.size - 1, 1) * GRAPH_WIDTH
+        ys = GRAPH_Y + GRAPH_HEIGHT - (populations - min_population) / span * GRAPH_HEIGHT
+        coordinates = np.column_stack((xs, ys)).astype(int)
+        self.line_points = coordinates.tolist()
+        self.points = [(self.point, (x - POINT_RADIUS, y - POINT_RADIUS)) for x, y in self.line_points]
+
+    def draw(self, screen):
+        screen.blit(self.layer, (0, 0))
+        # Draw the graph points and the lines connecting them in one batch each
+        screen.blits(self.points, doreturn=False)
+        if len(self.line_points) > 1:
+            pygame.draw.lines(screen, LIGHT_GRAY, False, self.line_points, 2)
+
+# Renders the long-run mode: every initial population gets a panel showing the
+# min/max envelope of its trajectory as a faint band, one column of generations
+# per pixel, with the first and last population of every column drawn on top as
+# points. For chaotic orbits the band fills the panel whatever the initial
+# population, while the sampled points still differ between panels. The cost
+# of drawing depends on the graph width only
+class EnvelopeRenderer:
+    BAND_OPACITY = 0.35  # Share of the lane color in the band backdrop
+
+    def __init__(self):
+        self.layer = None
+        self.layer_key = None
+        self.lanes = []  # (color, band color, band polyline points, band width, sample rects) per initial population
+
+    def update(self, initial_populations, minima, maxima, firsts, lasts, generation_count):
+        # Pad the shared y-range so flat trajectories do not sit on the panel edges
+        min_population, max_population = float(minima.min()), float(maxima.max())
+        padding = 0.1 * (max_population - min_population) or 0.01
+        min_population, max_population = min_population - padding, max_population + padding
+        labels = tuple(f"x0 = {population:.9f}" for population in initial_populations)
+        key = (min_population, max_population, generation_count, labels)
+        if key != self.layer_key:
+            self.layer = create_graph_layer(min_population, max_population, generation_count, labels)
+            self.layer_key = key
+
+        span = max_population - min_population
+        columns = minima.shape[1]
+        panel_height = GRAPH_HEIGHT / len(initial_populations)
+        xs = GRAPH_X + (np.arange(columns) + 0.5) * (GRAPH_WIDTH / columns)
+        # Columns alternate between going up and down, so one polyline traces both edges of the band
+        rising = np.arange(columns) % 2 == 0
+        self.lanes = []
+        for lane, (low, high) in enumerate(zip(minima, maxima)):
+            panel_bottom = GRAPH_Y + (lane + 1) * panel_height
+            y_low = panel_bottom - (low - min_population) / span * panel_height
+            y_high = panel_bottom - (high - min_population) / span * panel_height
+            points = np.empty((2 * columns, 2))
+            points[:, 0] = np.repeat(xs, 2)
+            points[0::2, 1] = np.where(rising, y_low, y_high)
+            points[1::2, 1] = np.where(rising, y_high, y_low)
+            width = 1 if columns >= GRAPH_WIDTH else 2
+
+            # One 2 x 2 point per sampled population
+            samples = np.concatenate((firsts[lane], lasts[lane]))
+            sample_ys = panel_bottom - (samples - min_population) / span * panel_height
+            rects = [(x - 1, y - 1, 2, 2) for x, y in zip(np.tile(xs, 2).astype(int).tolist(),
+                                                          sample_ys.astype(int).tolist())]
+
+            color = LANE_COLORS[lane % len(LANE_COLORS)]
+            band_color = tuple(int(DARK_GRAY[i] + self.BAND_OPACITY * (color[i] - DARK_GRAY[i])) for i in range(3))
+            self.lanes.append((color, band_color, points.astype(int).tolist(), width, rects))
+
+    def draw(self, screen):
+        if self.layer is None:
+            screen.fill(DARK_GRAY)
+            return
+        screen.blit(self.layer, (0, 0))
+        for color, band_color, points, width, rects in self.lanes:
+            pygame.draw.lines(screen, band_color, False, points, width)
+            for rect in rects:
+                screen.fill(color, rect)
+
+# Generation count picked by the long-run slider (log10 scale)
+def long_generation_count(exponent):
+    return int(round(10 ** exponent))
+
+# Initial populations of the long-run panels: the slider value plus small offsets
+def long_run_populations(initial_population):
+    return tuple(min(max(initial_population + offset, 0.0), 1.0) for offset in Metrics.INITIAL_POPULATION_OFFSETS)
 
 # Main function
 def main():
+    global FONT
+
+    pygame.init()
+    FONT = pygame.font.SysFont("Arial", 24)
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("Population Growth Simulation")
 
@@ -134,60 +268,140 @@ def main():
                                       Metrics.GENERATION_COUNT_MIN, 
                                       Metrics.GENERATION_COUNT_MAX, 
                                       Metrics.GENERATION_COUNT_DEFAULT)
-
-    # Create Save button
+    long_generation_slider = Slider(50, 150, 300,
+                                    Metrics.LONG_GENERATION_EXPONENT_MIN,
+                                    Metrics.LONG_GENERATION_EXPONENT_MAX,
+                                    Metrics.LONG_GENERATION_EXPONENT_DEFAULT,
+                                    lambda exponent: f"{long_generation_count(exponent):,}")
+    long_run = LONG_RUN
+    sliders = [initial_population_slider, growth_rate_slider,
+               long_generation_slider if long_run else generation_count_slider]
+
+    # Create Save button and the long-run toggle
     save_button = Button(WIDTH - 150, HEIGHT - 50, 100, 40, "Save Graph")
-
+    mode_button = Button(WIDTH - 320, HEIGHT - 50, 150, 40, "Short run" if long_run else "Long run")
+
+    renderer = GraphRenderer()
+    envelope_renderer = EnvelopeRenderer()
+    instruments = Instrumentation(trace_filename=TIMING_TRACE)
+    overlay_font = pygame.font.SysFont(None, 22)
+    show_timings = SHOW_TIMINGS
+
+    # Long runs are computed on a background thread, newest request first
+    progress = {"fraction": 0.0}
+    progress_eta = ThroughputEta()  # In fractions of the current run
+
+    def report_progress(done, total):
+        progress["fraction"] = done / total
+        progress_eta.update(progress["fraction"])
+
+    def compute_envelope(value, cancelled):
+        populations, growth_rate, generation_count = value
+        progress["fraction"] = 0.0
+        progress_eta.start()
+        start = time.perf_counter()
+        envelope = trajectory_envelope(populations, growth_rate, generation_count, GRAPH_WIDTH,
+                                       progress=report_progress, should_abort=cancelled)
+        instruments.add("compute", time.perf_counter() - start)
+        if envelope is None:
+            raise JobCancelled()
+        return envelope
+
+    worker = LatestJobRunner(compute_envelope)
+    active_slider = None
+    last_values = None
+    dirty = True
     running = True
     clock = pygame.time.Clock()
 
     while running:
-        screen.fill(DARK_GRAY)
-
-        # Draw sliders and save button
-        initial_population_slider.draw(screen)
-        growth_rate_slider.draw(screen)
-        generation_count_slider.draw(screen)
-        save_button.draw(screen)
+        # Sleep until something happens instead of redrawing at a fixed rate
+        # (waking up for progress updates while a long run is computed)
+        first_event = pygame.event.wait(PROGRESS_INTERVAL) if worker.busy else pygame.event.wait()
+        events = [first_event] + pygame.event.get()
+        instruments.restart_frame()
 
         # Event handling
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:  # Left mouse button
-                    initial_population_slider.update(event.pos)
-                    growth_rate_slider.update(event.pos)
-                    generation_count_slider.update(event.pos)
+                    for slider in sliders:
+                        if slider.update(event.pos):
+                            active_slider = slider
                     if save_button.is_clicked(event.pos):
                         pygame.image.save(screen, "population_growth_graph.png")
                         print("Graph saved as population_growth_graph.png")
-
-        # Calculate population growth
-        population_status = initial_population_slider.value
-        growth_rate = growth_rate_slider.value
-        generation_count = int(generation_count_slider.value)
-
-        populations_this_year = []
-        populations_next_year = []
-
-        for _ in range(generation_count):
-            # Check for division by zero
-            if population_status > 0: 
-                next_population = growth_rate * (population_status * (1 - population_status))
+                    elif mode_button.is_clicked(event.pos):
+                        long_run = not long_run
+                        mode_button.text = "Short run" if long_run else "Long run"
+                        sliders[2] = long_generation_slider if long_run else generation_count_slider
+            elif event.type == pygame.MOUSEMOTION and active_slider is not None:
+                active_slider.drag(event.pos[0])
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                active_slider = None
+            elif event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                dirty = True
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                show_timings = not show_timings
+                dirty = True
+
+        # Recalculate population growth only when a slider value (or the mode) changed
+        values = (long_run,) + tuple(slider.value for slider in sliders)
+        if values != last_values:
+            last_values = values
+            if long_run:
+                worker.submit((long_run_populations(initial_population_slider.value), growth_rate_slider.value,
+                               long_generation_count(long_generation_slider.value)))
             else:
-                next_population = 0  # If the population is zero, the next population remains zero
-
-            populations_this_year.append(population_status)
-            populations_next_year.append(next_population)
-            population_status = next_population
-
-        # Draw the graph directly on the Pygame screen
-        draw_graph(screen, populations_this_year, populations_next_year, generation_count)
-
-        pygame.display.flip()
-        clock.tick(30)
-
+                generation_count = int(generation_count_slider.value)
+                with instruments.stage("compute"):
+                    _, populations_next_year = trajectory(initial_population_slider.value,
+                                                          growth_rate_slider.value, generation_count)
+                with instruments.stage("rasterize"):
+                    renderer.update(populations_next_year, generation_count)
+            dirty = True
+
+        # Pick up the newest finished long run; keep the progress text moving meanwhile
+        finished = worker.poll()
+        if finished is not None:
+            (populations, _, generation_count), envelope = finished
+            with instruments.stage("rasterize"):
+                envelope_renderer.update(populations, *envelope, generation_count)
+            dirty = True
+        elif long_run and worker.busy:
+            dirty = True
+
+        if dirty and running:
+            with instruments.stage("blit"):
+                # Draw the graph directly on the Pygame screen
+                if long_run:
+                    envelope_renderer.draw(screen)
+                else:
+                    renderer.draw(screen)
+
+                # Draw sliders and buttons
+                for slider in sliders:
+                    slider.draw(screen)
+                save_button.draw(screen)
+                mode_button.draw(screen)
+                if long_run and worker.busy:
+                    eta = progress_eta.eta(1.0 - progress["fraction"])
+                    text = f"Computing {progress['fraction']:.0%}" + (f", {eta:.0f} s left" if eta else "")
+                    label = FONT.render(text, True, LIGHT_GRAY)
+                    screen.blit(label, (GRAPH_X + GRAPH_WIDTH - label.get_width(), 50))
+                if show_timings:
+                    instruments.draw_overlay(screen, overlay_font, (WIDTH - 420, 10))
+
+            with instruments.stage("flip"):
+                pygame.display.flip()
+            instruments.end_frame()
+            dirty = False
+            clock.tick(60)  # Cap redraws while dragging
+
+    worker.close()
+    instruments.close()
     pygame.quit()
 
 if __name__ == "__main__":
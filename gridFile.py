@@ -0,0 +1,141 @@
+import os
+import warnings
+
+import numpy as np
+
+from arrayFile import create_array_file, open_array_file
+
+# Binary Mandelbrot grids: iteration counts stored as uint16 (or uint32 when
+# max_iter does not fit) in an arrayFile with a header recording width, height,
+# bounds and max_iter, so the data describes itself and opens with np.memmap
+BOUND_KEYS = ("X_min", "X_max", "Y_min", "Y_max")
+
+
+# Smallest unsigned type that holds every count up to max_iter
+def count_dtype(max_iter):
+    return np.uint16 if max_iter <= np.iinfo(np.uint16).max else np.uint32
+
+
+def _grid_metadata(width, height, bounds, max_iter):
+    metadata = {"Width": int(width), "Height": int(height), "max_iter": int(max_iter)}
+    metadata.update({key: float(value) for key, value in zip(BOUND_KEYS, bounds)})
+    return metadata
+
+
+# Create an empty grid file and return it as a writable (height, width) memory map
+def create_grid(filename, width, height, bounds, max_iter):
+    return create_array_file(filename, (height, width), count_dtype(max_iter),
+                             _grid_metadata(width, height, bounds, max_iter))
+
+
+# Write a complete (height, width) count array to a grid file
+def save_grid(filename, counts, bounds, max_iter):
+    height, width = counts.shape
+    grid = create_grid(filename, width, height, bounds, max_iter)
+    grid[...] = counts
+    if isinstance(grid, np.memmap):
+        grid.flush()
+    return grid
+
+
+# Describe every parameter in `expected` (e.g. from config.txt) that the grid header disagrees with
+def mismatched_parameters(metadata, expected):
+    return [f"{key}={expected[key]!r} (file has {metadata[key]!r})"
+            for key in ("Width", "Height", "max_iter") + BOUND_KEYS
+            if key in expected and expected[key] != metadata[key]]
+
+
+# Open a grid file without copying, returning (counts, metadata). The header is
+# checked against the stored data, and against `expected` parameters (e.g. from
+# config.txt) when given; any disagreement raises ValueError
+def load_grid(filename, expected=None, check_values=False):
+    counts, metadata = open_array_file(filename)
+    if counts.shape != (metadata["Height"], metadata["Width"]):
+        raise ValueError(f"{filename}: header says {metadata['Width']}x{metadata['Height']} "
+                         f"but the data is {counts.shape[1]}x{counts.shape[0]}")
+    if check_values and counts.size and int(counts.max()) > metadata["max_iter"]:
+        raise ValueError(f"{filename}: counts exceed max_iter {metadata['max_iter']}")
+    if expected is not None:
+        mismatched = mismatched_parameters(metadata, expected)
+        if mismatched:
+            raise ValueError(f"{filename} does not match the expected parameters: " + ", ".join(mismatched))
+    return counts, metadata
+
+
+# Parse a block of text lines into a (rows, width) array, skipping lines that
+# are not valid rows like the line-by-line loader did
+def _parse_rows(lines, width, dtype):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        try:
+            values = np.fromstring(b" ".join(lines), dtype=dtype, sep=" ")
+            if values.size == len(lines) * width:
+                return values.reshape(len(lines), width)
+        except (ValueError, DeprecationWarning):
+            pass
+
+    # Slow path for a block with bad lines: find and drop them one by one
+    rows = []
+    for line in lines:
+        try:
+            row = np.array(line.split(), dtype=dtype)
+        except ValueError:
+            row = None
+        if row is None or row.size != width:
+            print(f"Warning: Data line is not valid: '{line.decode(errors='replace')}'")
+            continue
+        rows.append(row)
+    return np.array(rows, dtype=dtype).reshape(-1, width)
+
+
+# Convert a legacy whitespace-separated text grid (one row per line) into a
+# binary grid file, chunk_lines rows at a time; returns (counts, metadata).
+# max_iter=None uses the C renderer's convention of height / 5.
+def import_text_grid(text_filename, grid_filename, bounds, max_iter=None, chunk_lines=256):
+
+    # First pass: row count and width, without parsing any numbers
+    width, height = 0, 0
+    with open(text_filename, "rb") as file:
+        for line in file:
+            if line.strip():
+                if height == 0:
+                    width = len(line.split())
+                height += 1
+    derived_max_iter = max_iter is None
+    if derived_max_iter:
+        max_iter = height // 5
+    dtype = count_dtype(max_iter)
+
+    grid = create_grid(grid_filename + ".tmp", width, height, bounds, max_iter)
+    row = 0
+    with open(text_filename, "rb") as file:
+        block = []
+        for line in file:
+            line = line.strip()
+            if line:
+                block.append(line)
+            if len(block) == chunk_lines:
+                parsed = _parse_rows(block, width, dtype)
+                grid[row:row + len(parsed)] = parsed
+                row += len(parsed)
+                block = []
+        if block:
+            parsed = _parse_rows(block, width, dtype)
+            grid[row:row + len(parsed)] = parsed
+            row += len(parsed)
+    if isinstance(grid, np.memmap):
+        grid.flush()
+    del grid
+
+    if row != height:
+        # Some lines were skipped: rewrite with the rows that were actually read,
+        # deriving the header from those rows too
+        if derived_max_iter:
+            max_iter = row // 5
+        counts, _ = open_array_file(grid_filename + ".tmp")
+        save_grid(grid_filename, np.array(counts[:row]), bounds, max_iter)
+        del counts
+        os.remove(grid_filename + ".tmp")
+    else:
+        os.replace(grid_filename + ".tmp", grid_filename)
+    return load_grid(grid_filename)
@@ -1,64 +1,92 @@
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
+from logisticMap import growth_rate_grid
+from bifurcationExport import export_bifurcation, load_bifurcation
+from densityRaster import DensityRaster
+from attractorPeriods import export_attractors, load_attractors, period_doubling_table, period_windows
+from lyapunov import export_lyapunov, lyapunov_exponent, plot_lyapunov
 
 # Parameters for chaotic behavior
 maxGrowthRate = 4
 initialPopulation = 0.4
 generations = 50
 resolution = 0.001
-CurrentGrowthRate = 0
-growth_rates = []
-equil = []
+transient = generations
+samples = 100
+data_dtype = np.float32  # np.float64 keeps full precision at twice the size
+save_csv = False  # Also write logistic_map_data.csv (much slower than the binary file)
+compact_storage = True  # Store only the distinct points of periodic attractors (plus a period label)
+raster_width, raster_height = 3600, 2400
+raster_chunk = 1 << 22
+show_lyapunov = True  # Overlay the Lyapunov exponent (and save it to logistic_map_lyapunov.lmap)
+lyapunov_samples = 1000
+show_plot = True  # Open the plot window at the end; False for headless runs
 
-# Data collection for high-resolution points
-data_points = []
+raster = DensityRaster(raster_width, raster_height, (0, maxGrowthRate), (0, 1))
+growth_rate_values = growth_rate_grid(0, maxGrowthRate, resolution)
 
-# Simulation with chaotic tracking
-while CurrentGrowthRate < maxGrowthRate - resolution:
-    currentPopulation = initialPopulation
-    
-    # Evolve population over the generations
-    for gen in range(generations):
-        next_population = CurrentGrowthRate * currentPopulation * (1 - currentPopulation)
-        currentPopulation = next_population
+if compact_storage:
+    # Detect the period of every orbit and keep one copy of each cycle point;
+    # chaotic orbits keep their last `samples` values
+    periods, _, _ = export_attractors('logistic_map_attractors.lmap', growth_rate_values, initialPopulation,
+                                      transient, chaotic_samples=samples, dtype=data_dtype,
+                                      csv_filename='logistic_map_attractors.csv' if save_csv else None)
+    growth_rates, equil, point_periods, _ = load_attractors('logistic_map_attractors.lmap')
+    print(f"Stored {equil.size} attractor points instead of {growth_rate_values.size * samples}")
 
-    # Collect population values and growth rates
-    for gen in range(100):
-        next_population = CurrentGrowthRate * currentPopulation * (1 - currentPopulation)
-        currentPopulation = next_population
-        equil.append(currentPopulation)
-        growth_rates.append(CurrentGrowthRate)
-        
-        # Store every point with high resolution
-        data_points.append((CurrentGrowthRate, currentPopulation))
-    
-    CurrentGrowthRate += resolution
+    print("Period doubling onsets (period, r, Feigenbaum ratio):")
+    for period, onset, ratio in period_doubling_table(growth_rate_values, periods):
+        print(f"  {period:3d}  r = {onset:.4f}" + (f"  delta ~ {ratio:.3f}" if ratio is not None else ""))
+    print("Periodic windows (period, first r, last r):")
+    for period, first, last in period_windows(growth_rate_values, periods):
+        print(f"  {period:3d}  {first:.4f} - {last:.4f}")
 
-# Convert the data points to a DataFrame for easy saving
-df = pd.DataFrame(data_points, columns=['Growth Rate', 'Population'])
+    # Each cycle point stands for samples / period generations, so the density matches the full sweep
+    weights = np.where(point_periods > 0, samples / np.maximum(point_periods, 1), 1.0)
+    raster.add(growth_rates, equil, weights)
+else:
+    # Simulation with chaotic tracking: growth rates are iterated in chunks and
+    # streamed straight to a memory-mappable binary file
+    export_bifurcation('logistic_map_data.lmap', growth_rate_values, initialPopulation, resolution,
+                       transient, samples, dtype=data_dtype,
+                       csv_filename='logistic_map_data.csv' if save_csv else None)
 
-# Save the data points to a CSV file
-df.to_csv('logistic_map_data.csv', index=False)
+    # Map the columns back for plotting without loading a second copy
+    growth_rates, equil, _ = load_bifurcation('logistic_map_data.lmap')
+
+    # Rasterize the samples into a fixed-size hit-count histogram (12x8 inches at 300 dpi),
+    # reading the mapped columns one chunk at a time
+    for start in range(0, growth_rates.size, raster_chunk):
+        raster.add(growth_rates[start:start + raster_chunk], equil[start:start + raster_chunk])
+
+# Save the bare density image directly as a PNG
+raster.save_png('logistic_map_raster.png')
 
 # Plotting the chaotic logistic map
-plt.figure(figsize=(12, 8), dpi=300)  # High resolution
+fig, ax = plt.subplots(figsize=(12, 8), dpi=300)  # High resolution
+
+# One embedded image for all points instead of one marker per point
+raster.draw(ax)
 
-# Scatter plot for all points
-plt.plot(growth_rates, equil, 'b.', markersize=0.5)  # Original points
-plt.scatter(df['Growth Rate'], df['Population'], c='red', s=1, label='Data Points')  # New points in red
+# Lyapunov exponent on a second y axis: chaos starts where it turns positive
+if show_lyapunov:
+    exponents = lyapunov_exponent(growth_rate_values, initialPopulation, transient, lyapunov_samples)
+    export_lyapunov('logistic_map_lyapunov.lmap', growth_rate_values, exponents, initialPopulation,
+                    transient, lyapunov_samples)
+    plot_lyapunov(ax, growth_rate_values, exponents, overlay=True)
 
-plt.title(f'Logistic Map: Population Equilibrium vs Growth Rate (Resolution = {resolution})')
-plt.xlabel('Growth Rate')
-plt.ylabel('Equilibrium Population')
-plt.grid(True)
-plt.legend()
-plt.tight_layout()
+ax.set_title(f'Logistic Map: Population Equilibrium vs Growth Rate (Resolution = {resolution})')
+ax.set_xlabel('Growth Rate')
+ax.set_ylabel('Equilibrium Population')
+ax.grid(True)
+fig.tight_layout()
 
-# Save the plot as an SVG file
-plt.savefig('logistic_map.svg', format='svg', bbox_inches='tight')
+# Save the plot as PNG, SVG and PDF (the vector files embed the raster)
+fig.savefig('logistic_map.png', format='png', bbox_inches='tight')
+fig.savefig('logistic_map.svg', format='svg', bbox_inches='tight')
 # Save as PDF before showing the plot
-plt.savefig('logistic_map.pdf', format='pdf', bbox_inches='tight')
+fig.savefig('logistic_map.pdf', format='pdf', bbox_inches='tight')
 
 # Show the plot
-plt.show()
+if show_plot:
+    plt.show()
@@ -1,15 +1,15 @@
+import os
+import time
 import pygame
-import matplotlib.pyplot as plt
 import numpy as np
-from matplotlib.backends.backend_agg import FigureCanvasAgg
-
-# Initialize Pygame
-pygame.init()
+from logisticMap import growth_rate_grid, bifurcation, bifurcation_chunks
+from densityRaster import DensityRaster
+from backgroundJob import JobCancelled, LatestJobRunner
+from attractorCube import AttractorCube, build_attractor_cube
+from instrumentation import Instrumentation
 
 # Screen dimensions (1080p resolution)
 width, height = 1920, 1080
-screen = pygame.display.set_mode((width, height))
-pygame.display.set_caption('Logistic Map Simulation with Initial Population Slider')
 
 # Slider parameters
 slider_x = 100
@@ -21,6 +21,17 @@ slider_value = initial_population
 maxGrowthRate = 3.99
 generations = 400
 resolution = 0.01
+use_raster = True  # Draw the diagram as a density raster instead of individual markers
+raster_width, raster_height = 1400, 1000
+render_mode = 'fast'  # 'fast' writes pixels directly; 'matplotlib' renders a full figure per update
+plot_rect = pygame.Rect(220, 110, 1580, 760)  # Plot area of the fast render mode
+chunk_size = 4096  # Growth rates per chunk; cancellation is checked between chunks
+fps = 60
+use_cube = True  # Read precomputed slices from the attractor cube instead of rerunning the sweep
+cube_filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'logistic_map_cube.lmap')
+cube_populations = 501  # Initial populations stored in the cube (0 to 1 inclusive)
+show_timings = False  # Timing overlay, toggled with F3
+timing_trace = None  # e.g. 'growth_timings.csv' for a per-frame CSV trace
 
 # Colors
 WHITE = (255, 255, 255)
@@ -30,41 +41,84 @@ GRAY = (200, 200, 200)
 RED = (255, 0, 0)
 HOVER_RED = (200, 0, 0)  # Color when hovered
 
-# Fonts
-font = pygame.font.SysFont(None, 36)
+# Created by main() once pygame is initialized
+font = None
+timing_font = None
+cube = None
 
-# Function to create a logistic map graph for a given initial population
-def create_logistic_map_graph(initial_population):
-    equil = []
-    growth_rates = []
-    CurrentGrowthRate = 0
-
-    # Run the logistic map simulation
-    while CurrentGrowthRate < maxGrowthRate - resolution:
-        currentPopulation = initial_population
-        for gen in range(generations):
-            next_population = CurrentGrowthRate * currentPopulation * (1 - currentPopulation)
-            currentPopulation = next_population
-        
-        # Collect population values only from the last 100 generations
-        for gen in range(100):
-            next_population = CurrentGrowthRate * currentPopulation * (1 - currentPopulation)
-            currentPopulation = next_population
-            equil.append(currentPopulation)
-            growth_rates.append(CurrentGrowthRate)
-        
-        CurrentGrowthRate += resolution
+# Stage timings (the worker thread reports its compute/rasterize times with add())
+instruments = None
+
+# Function to build (or update) the attractor cube for the current settings and open it;
+# only slices that are missing for these settings are computed. Runs on a background
+# worker while the window shows live sweeps; quitting cancels it between chunks
+def load_attractor_cube(_=None, cancelled=lambda: False):
+    def report(done, total):
+        if cancelled():
+            raise JobCancelled()
+        print(f"Precomputing attractor cube: {done}/{total}", end='\r' if done < total else '\n')
+
+    os.makedirs(os.path.dirname(cube_filename), exist_ok=True)
+    build_attractor_cube(cube_filename, np.linspace(0, 1, cube_populations),
+                         growth_rate_grid(0, maxGrowthRate, resolution), generations, 100, progress=report)
+    return AttractorCube(cube_filename)
+
+# Function to run the sweep for a given initial population and bin it into a
+# density raster. `cancelled` is polled between chunks of growth rates.
+def compute_logistic_map_raster(initial_population, size, cancelled=lambda: False):
+    raster = DensityRaster(size[0], size[1], (0, maxGrowthRate), (0, 1))
+    if cube is not None:
+        # Interpolate between the two nearest precomputed slices
+        raster.add(*cube.columns(initial_population, interpolate=True))
+        return raster
+
+    # Run the logistic map simulation for every growth rate at once,
+    # collecting population values only from the last 100 generations
+    growth_rates = growth_rate_grid(0, maxGrowthRate, resolution)
+    for rates, equil in bifurcation_chunks(growth_rates, initial_population, generations, 100,
+                                           chunk_size=chunk_size):
+        if cancelled():
+            raise JobCancelled()
+        raster.add(rates, equil)
+    return raster
+
+# Function to build the matplotlib figure for a given initial population
+def create_logistic_map_figure(initial_population, cancelled=lambda: False):
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import MultipleLocator
 
     # Plot the logistic map
-    fig, ax = plt.subplots(figsize=(14, 10))  # Upscale the figure size
-    ax.plot(growth_rates, equil, 'b.', markersize=0.5)
+    fig = Figure(figsize=(14, 10))  # Upscale the figure size
+    ax = fig.add_subplot()
+    if use_raster:
+        # Bin the samples into one density image instead of plotting every point
+        compute_logistic_map_raster(initial_population, (raster_width, raster_height), cancelled).draw(ax)
+    else:
+        if cube is not None:
+            growth_rates, equil = cube.columns(initial_population, interpolate=True)
+        else:
+            growth_rates, equil = bifurcation(growth_rate_grid(0, maxGrowthRate, resolution),
+                                              initial_population, generations, 100)
+        ax.plot(growth_rates, equil, 'b.', markersize=0.5)
     ax.set_title('Logistic Map: Population Equilibrium vs Growth Rate', fontsize=16)
     ax.set_xlabel('Growth Rate', fontsize=14)
     ax.set_ylabel('Equilibrium Population', fontsize=14)
 
     # Add periodic tick values to both sides
-    ax.xaxis.set_major_locator(plt.MultipleLocator(0.5))  # X-axis ticks every 0.5 units
-    ax.yaxis.set_major_locator(plt.MultipleLocator(0.2))  # Y-axis ticks every 0.2 units
+    ax.xaxis.set_major_locator(MultipleLocator(0.5))  # X-axis ticks every 0.5 units
+    ax.yaxis.set_major_locator(MultipleLocator(0.2))  # Y-axis ticks every 0.2 units
+    return fig
+
+# Function to create a logistic map graph for a given initial population
+# ('matplotlib' render mode). Runs on the background worker, so it only uses the
+# object-oriented matplotlib API (pyplot is not thread-safe) and returns raw
+# RGBA bytes instead of a pygame surface.
+def create_logistic_map_graph(initial_population, cancelled=lambda: False):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = create_logistic_map_figure(initial_population, cancelled)
+    if cancelled():
+        raise JobCancelled()
 
     # Draw the canvas
     canvas = FigureCanvasAgg(fig)
@@ -73,8 +127,49 @@ def create_logistic_map_graph(initial_population):
     raw_data = renderer.buffer_rgba()
 
     size = canvas.get_width_height()
-    plt.close(fig)  # Close the figure to avoid memory leaks
-    return pygame.image.fromstring(raw_data.tobytes(), size, "RGBA"), fig  # Return the figure for saving
+    return raw_data.tobytes(), size
+
+# Function to create the plot pixels for a given initial population ('fast'
+# render mode): the raster is tone mapped straight into an RGB array, no figure
+def create_logistic_map_pixels(initial_population, cancelled=lambda: False):
+    start = time.perf_counter()
+    raster = compute_logistic_map_raster(initial_population, plot_rect.size, cancelled)
+    binned = time.perf_counter()
+    pixels = raster.to_rgb(ink=BLUE, background=WHITE)
+    instruments.add("compute", binned - start)
+    instruments.add("rasterize", time.perf_counter() - binned)
+    return pixels
+
+# Function to draw the static axes, ticks and labels of the fast mode once,
+# onto a transparent overlay that is blitted over the plot pixels every frame
+def create_axes_overlay():
+    overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+    tick_font = pygame.font.SysFont(None, 28)
+    pygame.draw.rect(overlay, BLACK, plot_rect.inflate(2, 2), 1)
+
+    # X-axis ticks every 0.5 units
+    for i in range(int(maxGrowthRate / 0.5) + 1):
+        value = i * 0.5
+        x = plot_rect.left + value / maxGrowthRate * (plot_rect.width - 1)
+        pygame.draw.line(overlay, BLACK, (x, plot_rect.bottom), (x, plot_rect.bottom + 8))
+        label = tick_font.render(f'{value:.1f}', True, BLACK)
+        overlay.blit(label, (x - label.get_width() / 2, plot_rect.bottom + 12))
+
+    # Y-axis ticks every 0.2 units
+    for i in range(6):
+        value = i * 0.2
+        y = plot_rect.bottom - 1 - value * (plot_rect.height - 1)
+        pygame.draw.line(overlay, BLACK, (plot_rect.left - 8, y), (plot_rect.left, y))
+        label = tick_font.render(f'{value:.1f}', True, BLACK)
+        overlay.blit(label, (plot_rect.left - 14 - label.get_width(), y - label.get_height() / 2))
+
+    title = font.render('Logistic Map: Population Equilibrium vs Growth Rate', True, BLACK)
+    overlay.blit(title, (plot_rect.centerx - title.get_width() / 2, plot_rect.top - 45))
+    x_label = font.render('Growth Rate', True, BLACK)
+    overlay.blit(x_label, (plot_rect.centerx - x_label.get_width() / 2, plot_rect.bottom + 40))
+    y_label = pygame.transform.rotate(font.render('Equilibrium Population', True, BLACK), 90)
+    overlay.blit(y_label, (plot_rect.left - 110, plot_rect.centery - y_label.get_height() / 2))
+    return overlay
 
 # Function to draw the slider
 def draw_slider(screen, x, y, width, height, value):
@@ -90,53 +185,145 @@ def draw_save_button(screen, x, y, width, height, is_hovered):
     text = font.render("Save Graph", True, WHITE)
     screen.blit(text, (x + 10, y + 10))
 
-# Main loop
-running = True
-graph_image, graph_fig = create_logistic_map_graph(initial_population)  # Generate initial graph
+# Function to draw the busy indicator while a newer graph is being computed
+def draw_busy_indicator(screen, x, y):
+    dots = '.' * (pygame.time.get_ticks() // 300 % 4)
+    text = font.render(f'Computing{dots}', True, RED)
+    screen.blit(text, (x, y))
+
+# Function to map a mouse x position onto the slider range
+def slider_position(mouse_x):
+    return min(max((mouse_x - slider_x) / slider_width, 0.0), 1.0)
+
+# Main function
+def main():
+    global font, timing_font, cube, instruments, initial_population, slider_value, show_timings
+
+    pygame.init()
+    screen = pygame.display.set_mode((width, height))
+    pygame.display.set_caption('Logistic Map Simulation with Initial Population Slider')
+    font = pygame.font.SysFont(None, 36)
+    timing_font = pygame.font.SysFont(None, 22)
+    instruments = Instrumentation(trace_filename=timing_trace, frame_budget=1 / fps)
+    # The cube is built in the background; until it is ready graphs come from live sweeps
+    cube = None
+    cube_builder = None
+    if use_cube:
+        cube_builder = LatestJobRunner(load_attractor_cube)
+        cube_builder.submit(None)
+
+    # Main loop
+    running = True
+    dragging = False
+    clock = pygame.time.Clock()
+    graph_image = None
+    graph_data = None  # Keeps the pixel bytes alive while graph_image shares them
+    if render_mode == 'fast':
+        # Preallocated plot surface and the cached axes layer
+        plot_surface = pygame.Surface(plot_rect.size)
+        plot_surface.fill(WHITE)
+        axes_overlay = create_axes_overlay()
+        worker = LatestJobRunner(create_logistic_map_pixels)
+    else:
+        worker = LatestJobRunner(create_logistic_map_graph)
+    worker.submit(initial_population)  # Generate initial graph
+
+    while running:
+        instruments.restart_frame()
+        screen.fill(WHITE)
+        mouse_pos = pygame.mouse.get_pos()
+        is_hovered = 50 <= mouse_pos[0] <= 200 and 50 <= mouse_pos[1] <= 100  # Save button hover
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+
+            # Slider control
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                if slider_x <= event.pos[0] <= slider_x + slider_width and slider_y <= event.pos[1] <= slider_y + slider_height:
+                    dragging = True
+                    slider_value = slider_position(event.pos[0])
+                    initial_population = slider_value
+                    # Update graph in the background when slider is adjusted
+                    worker.submit(initial_population)
+
+                # Save button control
+                if 50 <= event.pos[0] <= 200 and 50 <= event.pos[1] <= 100:  # Save button dimensions
+                    # Build the publication-quality figure only now, then save it as SVG, PNG, and JPEG
+                    graph_fig = create_logistic_map_figure(initial_population)
+                    graph_fig.savefig('logistic_map.svg')
+                    graph_fig.savefig('logistic_map.png', dpi=300)  # High DPI for better quality
+                    graph_fig.savefig('logistic_map.jpg', dpi=300)  # High DPI for better quality
+                    print("Graph saved as 'logistic_map.svg', 'logistic_map.png', and 'logistic_map.jpg'.")
+
+            # Scrub while dragging; only the newest value is kept by the worker
+            elif event.type == pygame.MOUSEMOTION and dragging:
+                new_value = slider_position(event.pos[0])
+                if new_value != slider_value:
+                    slider_value = new_value
+                    initial_population = slider_value
+                    worker.submit(initial_population)
+
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                dragging = False
+
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                show_timings = not show_timings
 
-while running:
-    screen.fill(WHITE)
-    is_hovered = False  # Track if the mouse is hovering over the button
+        # Switch to the cube once it is built and redraw the current graph from it
+        if cube_builder is not None:
+            built = cube_builder.poll()
+            if built is not None:
+                cube = built[1]
+                worker.submit(initial_population)
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
+        # Pick up the newest finished graph, if any
+        finished = worker.poll()
+        with instruments.stage("blit"):
+            if finished is not None:
+                if render_mode == 'fast':
+                    # Copy the (height, width, 3) pixels into the surface's (x, y) layout
+                    pygame.surfarray.blit_array(plot_surface, finished[1].swapaxes(0, 1))
+                else:
+                    graph_data, size = finished[1]
+                    graph_image = pygame.image.frombuffer(graph_data, size, "RGBA")
 
-        # Slider control
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            if slider_x <= event.pos[0] <= slider_x + slider_width and slider_y <= event.pos[1] <= slider_y + slider_height:
-                slider_value = (event.pos[0] - slider_x) / slider_width
-                initial_population = slider_value
-                # Update graph when slider is adjusted
-                graph_image, graph_fig = create_logistic_map_graph(initial_population)
+            # Display the last finished graph (centered on screen)
+            if render_mode == 'fast':
+                screen.blit(plot_surface, plot_rect.topleft)
+                screen.blit(axes_overlay, (0, 0))
+            elif graph_image is not None:
+                screen.blit(graph_image, (100, 50))  # Adjusted for 1080p resolution
 
-            # Save button control
-            if 50 <= event.pos[0] <= 200 and 50 <= event.pos[1] <= 100:  # Save button dimensions
-                # Save the graph as SVG, PNG, and JPEG
-                graph_fig.savefig('logistic_map.svg')
-                graph_fig.savefig('logistic_map.png', dpi=300)  # High DPI for better quality
-                graph_fig.savefig('logistic_map.jpg', dpi=300)  # High DPI for better quality
-                print("Graph saved as 'logistic_map.svg', 'logistic_map.png', and 'logistic_map.jpg'.")
+        # Draw the slider
+        draw_slider(screen, slider_x, slider_y, slider_width, slider_height, slider_value)
 
-        # Check for hover
-        if 50 <= event.pos[0] <= 200 and 50 <= event.pos[1] <= 100:
-            is_hovered = True
+        # Draw slider value
+        value_text = font.render(f'Initial Population: {initial_population:.3f}', True, BLACK)
+        screen.blit(value_text, (slider_x + slider_width + 20, slider_y - 20))
 
-    # Display the graph (centered on screen)
-    screen.blit(graph_image, (100, 50))  # Adjusted for 1080p resolution
+        # Show that the displayed graph is out of date while the worker catches up
+        if worker.busy:
+            draw_busy_indicator(screen, slider_x, slider_y - 50)
 
-    # Draw the slider
-    draw_slider(screen, slider_x, slider_y, slider_width, slider_height, slider_value)
+        # Draw the save button with hover effect
+        draw_save_button(screen, 50, 50, 150, 40, is_hovered)
 
-    # Draw slider value
-    value_text = font.render(f'Initial Population: {initial_population:.3f}', True, BLACK)
-    screen.blit(value_text, (slider_x + slider_width + 20, slider_y - 20))
+        if show_timings:
+            instruments.draw_overlay(screen, timing_font, (width - 420, 10))
 
-    # Draw the save button with hover effect
-    draw_save_button(screen, 50, 50, 150, 40, is_hovered)
+        # Update the display
+        with instruments.stage("flip"):
+            pygame.display.flip()
+        instruments.end_frame()
+        clock.tick(fps)
 
-    # Update the display
-    pygame.display.flip()
+    # Quit Pygame
+    worker.close()
+    if cube_builder is not None:
+        cube_builder.close()
+    instruments.close()
+    pygame.quit()
 
-# Quit Pygame
-pygame.quit()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import csv
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Per-frame timing of the interactive apps. Each frame accumulates the time
+# spent in named stages (compute, rasterize/color, blit, flip); end_frame()
+# pushes the totals into rolling windows for percentiles and, when a trace file
+# is given, appends one CSV row per frame. Nested stages count exclusively: a
+# stage opened inside another is subtracted from the outer one, so a render
+# loop that calls the display code from a progress callback still splits cleanly.
+DEFAULT_STAGES = ("compute", "rasterize", "blit", "flip")
+DEFAULT_WINDOW = 240  # Frames kept for the rolling percentiles
+DEFAULT_PERCENTILES = (50, 95, 99)
+
+
+class Instrumentation:
+    def __init__(self, stages=DEFAULT_STAGES, window=DEFAULT_WINDOW, trace_filename=None,
+                 frame_budget=1 / 60):
+        self.stages = tuple(stages)
+        self.frame_budget = frame_budget
+        self.history = {name: deque(maxlen=window) for name in self.stages + ("frame",)}
+        self.frame_count = 0
+        self._lock = threading.Lock()  # add() may be called from worker threads
+        self._current = dict.fromkeys(self.stages, 0.0)
+        self._stack = []
+        self._frame_start = time.perf_counter()
+
+        self._trace_file = None
+        self._trace = None
+        if trace_filename is not None:
+            self._trace_file = open(trace_filename, "w", newline="")
+            self._trace = csv.writer(self._trace_file)
+            self._trace.writerow(("frame", "time_s") + tuple(f"{name}_ms" for name in self.stages + ("frame",)))
+
+    # Add time measured elsewhere (e.g. by a background job) to the current frame
+    def add(self, name, seconds):
+        with self._lock:
+            self._current[name] = self._current.get(name, 0.0) + seconds
+
+    # Time a block of the current frame under `name`
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        self._stack.append(0.0)  # Time used by stages nested in this one
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            self.add(name, elapsed - nested)
+
+    # Close the current frame: record the stage totals and the whole frame time
+    def end_frame(self):
+        now = time.perf_counter()
+        with self._lock:
+            current, self._current = self._current, dict.fromkeys(self.stages, 0.0)
+        current["frame"] = now - self._frame_start
+        self._frame_start = now
+        self.frame_count += 1
+        for name, history in self.history.items():
+            history.append(current.get(name, 0.0))
+        if self._trace is not None:
+            self._trace.writerow((self.frame_count, f"{now:.6f}") +
+                                 tuple(f"{current.get(name, 0.0) * 1000:.3f}"
+                                       for name in self.stages + ("frame",)))
+
+    # Start timing the next frame from now, e.g. after blocking for input
+    def restart_frame(self):
+        self._frame_start = time.perf_counter()
+
+    # Rolling percentiles of a stage in seconds, as a dict {percentile: value}
+    def percentiles(self, name, percentiles=DEFAULT_PERCENTILES):
+        values = self.history[name]
+        if not values:
+            return dict.fromkeys(percentiles, 0.0)
+        return dict(zip(percentiles, np.percentile(np.fromiter(values, dtype=np.float64), percentiles)))
+
+    # One text line per stage, e.g. "compute  p50 1.2  p95 3.4  p99 5.0 ms"
+    def summary_lines(self, percentiles=DEFAULT_PERCENTILES):
+        lines = []
+        for name in self.stages + ("frame",):
+            values = self.percentiles(name, percentiles)
+            lines.append(f"{name:<10}" + "  ".join(f"p{p} {values[p] * 1000:6.1f}" for p in percentiles) + " ms")
+        return lines
+
+    # True when the rolling p95 frame time exceeds the frame budget
+    def over_budget(self):
+        return self.percentiles("frame", (95,))[95] > self.frame_budget
+
+    # Draw the summary in a translucent box on a pygame surface
+    def draw_overlay(self, surface, font, position=(10, 10), extra_lines=()):
+        import pygame
+
+        lines = self.summary_lines() + list(extra_lines)
+        color = (255, 120, 120) if self.over_budget() else (230, 230, 230)
+        rendered = [font.render(line, True, color) for line in lines]
+        box = pygame.Surface((max(text.get_width() for text in rendered) + 12,
+                              sum(text.get_height() for text in rendered) + 12), pygame.SRCALPHA)
+        box.fill((0, 0, 0, 170))
+        y = 6
+        for text in rendered:
+            box.blit(text, (6, y))
+            y += text.get_height()
+        surface.blit(box, position)
+
+    def close(self):
+        if self._trace_file is not None:
+            self._trace_file.close()
+            self._trace_file = None
+            self._trace = None
+
+
+# Throughput-based ETA: fed the cumulative amount of finished work (tiles,
+# points, ...), it estimates the rate from the work done since start() and
+# predicts how long a given amount of remaining work will take
+class ThroughputEta:
+    def __init__(self):
+        self.start()
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.done = 0.0
+
+    def update(self, done):
+        self.done = done
+
+    # Units per second so far (None until some work has finished)
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self.start_time
+        if self.done <= 0 or elapsed <= 0:
+            return None
+        return self.done / elapsed
+
+    # Seconds until `remaining` more units are done at the current rate
+    def eta(self, remaining):
+        rate = self.rate
+        return None if rate is None else remaining / rate
@@ -0,0 +1,20 @@
+// Compiled block step for long logistic-map trajectories, loaded by
+// logisticKernel.py. Build flags keep x <- r * (x * (1 - x)) from being
+// contracted into a fused multiply-add, so every value matches the Python
+// and NumPy loops bit for bit.
+
+// Fill rows 0 .. steps - 1 of `values` (row i starts at values + i * row_stride)
+// with generations 1 .. steps of `lanes` orbits starting from `populations`.
+// The lanes are independent, so the inner loop overlaps their dependency chains
+void logistic_block(double growth_rate, const double *populations, long lanes, long steps,
+                    double *values, long row_stride) {
+    const double *previous = populations;
+    for (long i = 0; i < steps; i++) {
+        double *row = values + i * row_stride;
+        for (long j = 0; j < lanes; j++) {
+            double x = previous[j];
+            row[j] = growth_rate * (x * (1.0 - x));
+        }
+        previous = row;
+    }
+}
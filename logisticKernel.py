@@ -0,0 +1,63 @@
+import ctypes
+import hashlib
+import os
+import subprocess
+import threading
+
+import numpy as np
+
+# Optional compiled block step for trajectory_envelope. A chaotic orbit can
+# only be advanced one generation at a time, and a NumPy step costs one or two
+# microseconds per generation however few lanes it covers, so 10^8 generations
+# take minutes; logisticKernel.c runs the same step at a few nanoseconds. It is
+# built with the system C compiler ($CC, default cc) the first time it is
+# needed, into KERNEL_DIR under a name derived from the source, so an edited
+# source is rebuilt. Without a compiler block_kernel() returns None and callers
+# keep to NumPy.
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logisticKernel.c")
+KERNEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+COMPILE_FLAGS = ("-O2", "-ffp-contract=off", "-shared", "-fPIC")
+
+_lock = threading.Lock()
+_kernel = None
+_loaded = False
+
+
+def _build():
+    with open(SOURCE, "rb") as source:
+        digest = hashlib.sha1(source.read()).hexdigest()[:12]
+    library = os.path.join(KERNEL_DIR, f"logisticKernel-{digest}.so")
+    if not os.path.exists(library):
+        os.makedirs(KERNEL_DIR, exist_ok=True)
+        # Build under a temporary name so a concurrent start never loads a partial file
+        temporary = f"{library}.{os.getpid()}.tmp"
+        subprocess.run([os.environ.get("CC", "cc"), *COMPILE_FLAGS, "-o", temporary, SOURCE],
+                       check=True, capture_output=True)
+        os.replace(temporary, library)
+
+    function = ctypes.CDLL(library).logistic_block
+    function.argtypes = [ctypes.c_double, ctypes.c_void_p, ctypes.c_long, ctypes.c_long, ctypes.c_void_p,
+                         ctypes.c_long]
+    function.restype = None
+
+    # Fill values[i] (one column per population) with generation i + 1 of the populations
+    def step_block(values, populations, growth_rate):
+        populations = np.ascontiguousarray(populations, dtype=np.float64)
+        if values.dtype != np.float64 or values.strides[1] != values.itemsize:
+            raise ValueError("values must be float64 rows with contiguous lanes")
+        function(float(growth_rate), populations.ctypes.data, values.shape[1], values.shape[0],
+                 values.ctypes.data, values.strides[0] // values.itemsize)
+    return step_block
+
+
+# The compiled block step, built and loaded on first use, or None where it cannot be
+def block_kernel():
+    global _kernel, _loaded
+    with _lock:
+        if not _loaded:
+            _loaded = True
+            try:
+                _kernel = _build()
+            except (OSError, subprocess.CalledProcessError) as error:
+                print(f"Compiled logistic kernel unavailable, long trajectories use NumPy: {error}")
+    return _kernel
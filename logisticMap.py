@@ -0,0 +1,198 @@
+import numpy as np
+
+# Default sweep settings shared by growthRate.py and growthSlider.py
+DEFAULT_TRANSIENT = 50
+DEFAULT_SAMPLES = 100
+
+# Long trajectories (trajectory_envelope)
+ENVELOPE_BLOCK = 65536  # Generations computed between two reductions into the envelope
+MAX_CYCLE_PERIOD = 4096  # Longest exact cycle looked for at the end of every block
+
+
+# Build the growth rate grid from an exact sample count instead of
+# accumulating `+= resolution`, so every run sees the same r values
+def growth_rate_grid(min_growth_rate, max_growth_rate, resolution, dtype=np.float64):
+    count = int(round((max_growth_rate - min_growth_rate) / resolution))
+    if count <= 0:
+        return np.empty(0, dtype=dtype)
+    return np.linspace(min_growth_rate, max_growth_rate, count, endpoint=False, dtype=dtype)
+
+
+# One in-place logistic step for a whole array of populations: x <- r * x * (1 - x)
+# (evaluated as (r * x) * (1 - x) to match the scalar scripts bit for bit)
+def logistic_step(growth_rates, populations, scratch):
+    np.multiply(growth_rates, populations, out=scratch)
+    np.subtract(1.0, populations, out=populations)
+    populations *= scratch
+    return populations
+
+
+# Iterate every growth rate at once and return the post-transient samples
+# as a (len(growth_rates), samples) matrix
+def bifurcation_samples(growth_rates, initial_population, transient=DEFAULT_TRANSIENT,
+                        samples=DEFAULT_SAMPLES, dtype=np.float64):
+    growth_rates = np.asarray(growth_rates, dtype=dtype)
+    populations = np.full(growth_rates.shape, initial_population, dtype=dtype)
+    scratch = np.empty_like(populations)
+
+    # Discard the transient generations
+    for _ in range(transient):
+        logistic_step(growth_rates, populations, scratch)
+
+    # Collect population values from the following generations
+    # (stored sample-major so every write is contiguous)
+    out = np.empty((samples, growth_rates.size), dtype=dtype)
+    for gen in range(samples):
+        out[gen] = logistic_step(growth_rates, populations, scratch)
+
+    return out.T
+
+
+# Bifurcation sweep returning (growth_rate, population) column arrays,
+# one row per sample, ordered by growth rate like the original scalar loops
+def bifurcation(growth_rates, initial_population, transient=DEFAULT_TRANSIENT,
+                samples=DEFAULT_SAMPLES, dtype=np.float64):
+    growth_rates = np.asarray(growth_rates, dtype=dtype)
+    populations = bifurcation_samples(growth_rates, initial_population, transient, samples, dtype)
+    return np.repeat(growth_rates, samples), populations.ravel()
+
+
+# Stream the sweep one block of growth rates at a time, yielding
+# (growth_rate, population) column chunks so memory stays bounded by chunk_size
+def bifurcation_chunks(growth_rates, initial_population, transient=DEFAULT_TRANSIENT,
+                       samples=DEFAULT_SAMPLES, dtype=np.float64, chunk_size=65536):
+    growth_rates = np.asarray(growth_rates, dtype=dtype)
+    for start in range(0, growth_rates.size, chunk_size):
+        yield bifurcation(growth_rates[start:start + chunk_size], initial_population,
+                          transient, samples, dtype)
+
+
+# Trajectory of a single initial population over generation_count generations,
+# returned as (populations_this_year, populations_next_year) arrays
+def trajectory(initial_population, growth_rate, generation_count):
+    populations = np.empty(generation_count + 1, dtype=np.float64)
+    population_status = initial_population
+    populations[0] = population_status
+    for gen in range(generation_count):
+        # A population of zero (or below) stays at zero
+        if population_status > 0:
+            population_status = growth_rate * (population_status * (1 - population_status))
+        else:
+            population_status = 0
+        populations[gen + 1] = population_status
+    return populations[:-1], populations[1:]
+
+
+# Generation boundaries of `columns` equal slices of generation_count
+# generations: column c covers generations [bounds[c], bounds[c + 1])
+def envelope_bounds(generation_count, columns):
+    return np.arange(columns + 1, dtype=np.int64) * generation_count // columns
+
+
+# Fill values[i] (one column per population) with generation i + 1 of the
+# populations, evaluated as r * (x * (1 - x)) like trajectory(): by the compiled
+# step of logisticKernel where it can be built, else by one in-place NumPy step
+# over all populations per generation
+def _trajectory_block(values, populations, growth_rate):
+    from logisticKernel import block_kernel
+
+    kernel = block_kernel()
+    if kernel is not None:
+        kernel(values, populations, growth_rate)
+        return
+    previous = populations
+    for row in values:
+        np.subtract(1.0, previous, out=row)
+        np.multiply(row, previous, out=row)
+        np.multiply(row, growth_rate, out=row)
+        previous = row
+
+
+# Fold a block of values (generations start, start + 1, ...) into the column
+# minima/maxima of the given lanes, and record the first and last value of
+# every column that opens or closes inside the block
+def _reduce_envelope(values, start, bounds, minima, maxima, firsts, lasts, lanes):
+    first = np.searchsorted(bounds, start, side="right") - 1
+    columns = np.arange(first, np.searchsorted(bounds, start + values.shape[0], side="left"))
+    offsets = np.maximum(bounds[columns], start) - start
+    index = np.ix_(lanes, columns)
+    minima[index] = np.minimum(minima[index], np.minimum.reduceat(values, offsets, axis=0).T)
+    maxima[index] = np.maximum(maxima[index], np.maximum.reduceat(values, offsets, axis=0).T)
+    opening = columns[bounds[columns] >= start]
+    firsts[np.ix_(lanes, opening)] = values[bounds[opening] - start].T
+    closing = columns[bounds[columns + 1] <= start + values.shape[0]]
+    lasts[np.ix_(lanes, closing)] = values[bounds[closing + 1] - 1 - start].T
+
+
+# Period of every lane whose block ends on an exact repeat of one of its last
+# MAX_CYCLE_PERIOD values, 0 where there is none. The next population depends
+# on the current one only, so such an orbit cycles through the values in
+# between forever
+def _exact_periods(values):
+    window = min(MAX_CYCLE_PERIOD, values.shape[0] - 1)
+    if window < 1:
+        return np.zeros(values.shape[1], dtype=np.int64)
+    repeats = values[-1 - window:-1] == values[-1]
+    return np.where(repeats.any(axis=0), np.argmax(repeats[::-1], axis=0) + 1, 0)
+
+
+# Complete the envelope and column samples of one lane from generation
+# `start` on, where the population is cycle[(generation - start) % len(cycle)]
+def _fill_cycle(cycle, start, bounds, minima, maxima, firsts, lasts):
+    columns = np.arange(np.searchsorted(bounds, start, side="right") - 1, bounds.size - 1)
+    low = np.maximum(bounds[columns], start)
+    high = bounds[columns + 1]
+    opening = columns[bounds[columns] >= start]
+    firsts[opening] = cycle[(bounds[opening] - start) % cycle.size]
+    lasts[columns] = cycle[(high - 1 - start) % cycle.size]
+    # Columns holding at least one whole cycle take its extremes
+    whole = high - low >= cycle.size
+    minima[columns[whole]] = np.minimum(minima[columns[whole]], cycle.min())
+    maxima[columns[whole]] = np.maximum(maxima[columns[whole]], cycle.max())
+    for column, a, b in zip(columns[~whole], low[~whole], high[~whole]):
+        part = cycle[(np.arange(a, b) - start) % cycle.size]
+        minima[column] = min(minima[column], part.min())
+        maxima[column] = max(maxima[column], part.max())
+
+
+# Min/max envelope of the trajectories (the populations_next_year series of
+# trajectory()) of several initial populations in [0, 1], reduced to `columns`
+# slices of generations (envelope_bounds) block by block, so memory and drawing
+# cost stay O(columns) however many generations are run. Blocks are filled for
+# all populations at once into one preallocated buffer (_trajectory_block),
+# with trajectory()'s values bit for bit. An orbit that lands exactly on an
+# earlier value is periodic from then on, and the rest of its envelope is taken
+# from the cycle without iterating further. Returns (minima, maxima, firsts,
+# lasts), each (len(initial_populations), columns): the extremes and the first
+# and last value of every slice. None is returned when should_abort() fires
+# between blocks; progress(generations_done, generation_count) is called after
+# every block.
+def trajectory_envelope(initial_populations, growth_rate, generation_count, columns, block=ENVELOPE_BLOCK,
+                        progress=None, should_abort=None):
+    populations = np.array(initial_populations, dtype=np.float64, ndmin=1)
+    bounds = envelope_bounds(generation_count, max(1, min(columns, generation_count)))
+    minima = np.full((populations.size, bounds.size - 1), np.inf)
+    maxima = np.full((populations.size, bounds.size - 1), -np.inf)
+    firsts = np.empty_like(minima)
+    lasts = np.empty_like(minima)
+    buffer = np.empty((min(block, generation_count), populations.size))
+    active = np.arange(populations.size)  # Lanes not known to be periodic yet
+    start = 0
+    while start < generation_count and active.size:
+        if should_abort is not None and should_abort():
+            return None
+        stop = min(start + block, generation_count)
+        values = buffer[:stop - start, :active.size]
+        _trajectory_block(values, populations[active], growth_rate)
+        populations[active] = values[-1]
+        _reduce_envelope(values, start, bounds, minima, maxima, firsts, lasts, active)
+
+        periods = _exact_periods(values)
+        for lane in np.nonzero(periods)[0]:
+            _fill_cycle(values[-periods[lane]:, lane].copy(), stop, bounds, minima[active[lane]],
+                        maxima[active[lane]], firsts[active[lane]], lasts[active[lane]])
+        active = active[periods == 0]
+        start = stop
+        if progress is not None:
+            progress(start if active.size else generation_count, generation_count)
+    return minima, maxima, firsts, lasts
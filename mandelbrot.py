@@ -1,47 +1,50 @@
 import numpy as np
-import matplotlib.pyplot as plt
-
-# Function to compute the Mandelbrot set
-def mandelbrot(c, max_iter):
-    z = np.zeros(c.shape, dtype=np.complex64)
-    mask = np.full(c.shape, True, dtype=bool)
-    output = np.zeros(c.shape, dtype=int)
-
-    for i in range(max_iter):
-        z[mask] = z[mask] ** 2 + c[mask]
-        mask = np.abs(z) <= 2
-        output += mask
-        print(str(i) + " / "+ str(max_iter) + " % " + str((i/max_iter)*100))
-
-
-    return output
-
-# Parameters for the Mandelbrot set
-width, height = 4000, 4000  # High resolution
-x_min, x_max = -2.5, 1.5
-y_min, y_max = -2.0, 2.0
-max_iterations = 1000
-
-# Create the complex grid
-x = np.linspace(x_min, x_max, width)
-y = np.linspace(y_min, y_max, height)
-X, Y = np.meshgrid(x, y)
-C = X + 1j * Y
-
-# Compute the Mandelbrot set
-mandelbrot_set = mandelbrot(C, max_iterations)
-
-# Plot the Mandelbrot set
-plt.figure(figsize=(10, 10), dpi=300)
-plt.imshow(mandelbrot_set, extent=[x_min, x_max, y_min, y_max], cmap='inferno')
-plt.colorbar(label='Iterations')
-plt.title('Mandelbrot Set')
-
-# Save the image without loss (max resolution PNG)
-plt.savefig("mandelbrot_high_res.png", format='png', dpi=300, bbox_inches='tight')
-
-# Show the image on the screen (optional)
-plt.show()
-
-
-
+from escapeTime import escape_time
+from parallelRender import render_parallel
+
+# Function to compute the Mandelbrot set: iteration count of each point,
+# with the active-set kernel from escapeTime.py
+def mandelbrot(c, max_iter, dtype=np.complex64, progress=None):
+    return escape_time(c, max_iter, dtype=dtype, progress=progress)
+
+# Progress callback: one line per completed chunk or band instead of per iteration
+def print_progress(done, total):
+    print(f"{done} / {total} % {done / total * 100:.1f}")
+
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
+    # Parameters for the Mandelbrot set
+    width, height = 4000, 4000  # High resolution
+    x_min, x_max = -2.5, 1.5
+    y_min, y_max = -2.0, 2.0
+    max_iterations = 1000
+    precision = np.complex64  # np.complex128 for deeper views
+    use_processes = True  # Render row bands on all cores
+
+    if use_processes:
+        # Compute the Mandelbrot set on the same linspace grid, band by band
+        mandelbrot_set = render_parallel(x_min, x_max, y_min, y_max, width, height, max_iterations,
+                                         endpoint=True, complex_dtype=precision,
+                                         progress=print_progress)
+    else:
+        # Create the complex grid
+        x = np.linspace(x_min, x_max, width)
+        y = np.linspace(y_min, y_max, height)
+        X, Y = np.meshgrid(x, y)
+        C = X + 1j * Y
+
+        # Compute the Mandelbrot set
+        mandelbrot_set = mandelbrot(C, max_iterations, precision, print_progress)
+
+    # Plot the Mandelbrot set
+    plt.figure(figsize=(10, 10), dpi=300)
+    plt.imshow(mandelbrot_set, extent=[x_min, x_max, y_min, y_max], cmap='inferno')
+    plt.colorbar(label='Iterations')
+    plt.title('Mandelbrot Set')
+
+    # Save the image without loss (max resolution PNG)
+    plt.savefig("mandelbrot_high_res.png", format='png', dpi=300, bbox_inches='tight')
+
+    # Show the image on the screen (optional)
+    plt.show()
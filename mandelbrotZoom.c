@@ -1,16 +1,58 @@
 #include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
 
-// Function to compute Mandelbrot set and store it in a file
+// Grid file layout shared with gridFile.py / arrayFile.py: the magic string,
+// a little-endian uint32 header length, a JSON header padded with spaces to a
+// 64-byte boundary, then the uint16 iteration counts row by row
+#define GRID_MAGIC "CHAOSARR"
+#define GRID_ALIGNMENT 64
+
+static void write_u32_le(FILE *file, unsigned int value) {
+    unsigned char bytes[4] = {value & 0xff, (value >> 8) & 0xff, (value >> 16) & 0xff, (value >> 24) & 0xff};
+    fwrite(bytes, 1, 4, file);
+}
+
+// Write the self-describing header (width, height, bounds, max_iter)
+static void write_grid_header(FILE *file, int width, int height, double x_min, double x_max,
+                              double y_min, double y_max, int max_iter) {
+    char header[1024];
+    int length = snprintf(header, sizeof(header),
+        "{\"dtype\": \"<u2\", \"metadata\": {\"Height\": %d, \"Width\": %d, \"X_max\": %.17g, "
+        "\"X_min\": %.17g, \"Y_max\": %.17g, \"Y_min\": %.17g, \"max_iter\": %d}, \"shape\": [%d, %d]}",
+        height, width, x_max, x_min, y_max, y_min, max_iter, height, width);
+
+    int prefix = (int)strlen(GRID_MAGIC) + 4;
+    int padded = (prefix + length + 1 + GRID_ALIGNMENT - 1) / GRID_ALIGNMENT * GRID_ALIGNMENT;
+    int text_length = padded - prefix;
+
+    fwrite(GRID_MAGIC, 1, strlen(GRID_MAGIC), file);
+    write_u32_le(file, (unsigned int)text_length);
+    fwrite(header, 1, length, file);
+    for (int i = length; i < text_length - 1; i++) {
+        fputc(' ', file);
+    }
+    fputc('\n', file);
+}
+
+// Function to compute Mandelbrot set and store it in a binary grid file
 void mandelbrot(int width, int height, double x_min, double x_max, double y_min, double y_max, const char *output_filename) {
     int max_iter = height / 5;
-    FILE *file = fopen(output_filename, "w");
+    FILE *file = fopen(output_filename, "wb");
 
     if (!file) {
         printf("Error: Could not open output file.\n");
         exit(1);
     }
 
+    unsigned char *row = malloc((size_t)width * 2);
+    if (!row) {
+        printf("Error: Out of memory.\n");
+        exit(1);
+    }
+
+    write_grid_header(file, width, height, x_min, x_max, y_min, y_max, max_iter);
+
     double x_step = (x_max - x_min) / width;
     double y_step = (y_max - y_min) / height;
 
@@ -35,11 +77,13 @@ void mandelbrot(int width, int height, double x_min, double x_max, double y_min,
                 imag_z = imag_z_new;
                 iter++;
             }
-            // Store the number of iterations for each pixel
-            fprintf(file, "%d ", iter);
+            // Store the number of iterations for each pixel (uint16, little-endian)
+            row[2 * j] = iter & 0xff;
+            row[2 * j + 1] = (iter >> 8) & 0xff;
         }
-        fprintf(file, "\n");
+        fwrite(row, 1, (size_t)width * 2, file);
     }
+    free(row);
     fclose(file);
     printf("Mandelbrot set calculation finished and saved to %s\n", output_filename);
 }
@@ -51,7 +95,7 @@ int main() {
     double y_min = -1.5, y_max = 1.5;
 
     // File to store the results
-    const char *output_filename = "mandelbrot_data.txt";
+    const char *output_filename = "mandelbrot_data.grid";
 
     // Calculate the Mandelbrot set and store it
     mandelbrot(width, height, x_min, x_max, y_min, y_max, output_filename);
@@ -1,47 +1,85 @@
+import os
+from functools import partial
 import pygame
-import numpy as np
-import hashlib
 import time  # For timing and calculating ETA
+from chaosCore import build_palette
+from tileCache import TileCache, block_axes, level_pixel_size
+from progressiveRender import ProgressiveRender
+from perturbation import PerturbationKernel
+from parallelRender import ParallelRenderer
+from instrumentation import Instrumentation, ThroughputEta
+from backgroundJob import JobCancelled, LatestJobRunner
+from tileServer import TileClient
 
 # Constants
 WIDTH, HEIGHT = 800, 800
 MAX_ITER = 256
-ZOOM_FACTOR = 2
+ZOOM_FACTOR = 2  # Must be an integer so zoom levels share one pixel lattice
+TILE_SIZE = 200  # Pixels per tile side for the vectorized kernel
+BASE_PIXEL_SIZE = 4.0 / WIDTH  # Pixel size of the initial -2.5..1.5 view
+CACHE_MAX_BYTES = 256 * 2**20  # In-memory tile cache cap
+TILE_SPILL_DIR = None  # e.g. 'tile_cache' to keep tiles on disk across sessions
+PAN_STEP = WIDTH // 4  # Pixels moved per arrow key press
+USE_PROCESSES = True  # Compute missing tiles on all cores
+DEEP_ZOOM_PIXEL_SIZE = 1e-13  # Below this pixel size float64 coordinates run out and views use perturbation
+MAX_LEVEL = 1000  # Deepest zoom level; pixel sizes stay normal float64 numbers up to here
+SHOW_TIMINGS = False  # Timing overlay, toggled with F3
+TIMING_TRACE = None  # e.g. 'mandelbrot_timings.csv' for a per-frame CSV trace
+TILE_SERVER = None  # e.g. 'http://127.0.0.1:8765' to fetch tiles from a shared tileServer.py
+TILE_SERVER_TIMEOUT = 5  # Seconds before a tile server request counts as failed
+TILES_FETCHED = pygame.event.custom_type()  # Posted by the fetch worker when its tiles are ready
 SAVE_BUTTON_RECT = pygame.Rect(WIDTH - 150, HEIGHT - 50, 130, 40)
 
-# Mandelbrot computation
-def mandelbrot(c, max_iter):
-    z = 0
-    for n in range(max_iter):
-        if abs(z) > 2:
-            return n
-        z = z*z + c
-    return max_iter
-
-# Render the fractal
-def render_fractal(surface, x_min, x_max, y_min, y_max, cache):
-    pixel_array = pygame.PixelArray(surface)
-    width, height = surface.get_size()
-
-    for x in range(width):
-        for y in range(height):
-            # Map pixel to complex plane
-            re = x_min + (x / width) * (x_max - x_min)
-            im = y_min + (y / height) * (y_max - y_min)
-            c = complex(re, im)
-
-            # Use caching to avoid redundant calculations
-            key = hashlib.sha256(f"{c}".encode()).hexdigest()
-            if key in cache:
-                color = cache[key]
-            else:
-                m = mandelbrot(c, MAX_ITER)
-                color = (m % 8 * 32, m % 16 * 16, m % 32 * 8)  # Basic coloring
-                cache[key] = color
+PALETTE = build_palette(MAX_ITER)
+
+# Sample axes of a block of global pixels at a zoom level
+def region_axes(level, gx0, gy0, width, height):
+    return block_axes(BASE_PIXEL_SIZE, ZOOM_FACTOR, level, gx0, gy0, width, height)
+
+# True when a zoom level is too deep for plain float64 coordinates
+def is_deep(level):
+    return level_pixel_size(BASE_PIXEL_SIZE, ZOOM_FACTOR, level) < DEEP_ZOOM_PIXEL_SIZE
+
+# Start a progressive render of a view: float64 tiles for shallow levels,
+# perturbation around a high-precision reference orbit for deep ones
+def start_render(cache, level, px0, py0, renderer=None):
+    if is_deep(level):
+        kernel = PerturbationKernel(BASE_PIXEL_SIZE, ZOOM_FACTOR, level, px0, py0, WIDTH, HEIGHT, MAX_ITER)
+        return ProgressiveRender(cache, level, px0, py0, WIDTH, HEIGHT, TILE_SIZE, MAX_ITER, kernel=kernel)
+    return ProgressiveRender(cache, level, px0, py0, WIDTH, HEIGHT, TILE_SIZE, MAX_ITER, region_axes, renderer)
 
-            pixel_array[x, y] = color
+# Connect to the tile server, or return None (rendering locally) when it cannot be used
+def connect_tile_server():
+    try:
+        return TileClient(TILE_SERVER, TILE_SIZE, MAX_ITER, BASE_PIXEL_SIZE, timeout=TILE_SERVER_TIMEOUT)
+    except (OSError, ValueError) as error:
+        print(f"Tile server unavailable, computing locally: {error}")
+        return None
 
-    del pixel_array  # Release the lock on surface
+# Background job: fetch tiles (level, tx, ty) from the tile server while the
+# local progressive render runs, returning (key, tile) pairs, or None when the
+# server failed. Posts TILES_FETCHED so the main loop picks them up
+def fetch_tiles(client, keys, cancelled):
+    tiles = []
+    try:
+        for key, tile in client.mandelbrot_tiles(keys):
+            if cancelled():
+                raise JobCancelled()
+            tiles.append((key, tile))
+    except OSError as error:
+        print(f"Tile server unavailable, computing locally: {error}")
+        tiles = None
+    pygame.event.post(pygame.event.Event(TILES_FETCHED))
+    return tiles
+
+# Events that interrupt a progressive render (new zoom/pan, save, quit, fetched tiles)
+def render_interrupted():
+    return pygame.event.peek((pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN, pygame.QUIT, TILES_FETCHED))
+
+# Complex bounds of a view, for display
+def view_bounds(level, px0, py0):
+    pixel_size = level_pixel_size(BASE_PIXEL_SIZE, ZOOM_FACTOR, level)
+    return px0 * pixel_size, (px0 + WIDTH) * pixel_size, py0 * pixel_size, (py0 + HEIGHT) * pixel_size
 
 # Draw a save button on the screen
 def draw_save_button(screen):
@@ -58,56 +96,161 @@ def save_image(surface, filename='mandelbrot.png'):
 # Main function
 def mandelbrot_renderer():
     pygame.init()
-    
+
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("Mandelbrot Set Renderer with Zoom")
-    
-    x_min, x_max = -2.5, 1.5
-    y_min, y_max = -2.0, 2.0
-    cache = {}
+    fractal = pygame.Surface((WIDTH, HEIGHT))
+
+    # The view is its zoom level plus the global pixel at its top-left corner
+    # (-2.5..1.5 x -2.0..2.0 at level 0)
+    level = 0
+    px0, py0 = round(-2.5 / BASE_PIXEL_SIZE), round(-2.0 / BASE_PIXEL_SIZE)
+    history = []  # Previous views, restored with Backspace
+    spill_dir = None
+    if TILE_SPILL_DIR is not None:
+        spill_dir = os.path.join(TILE_SPILL_DIR, f"iter{MAX_ITER}_tile{TILE_SIZE}_zoom{ZOOM_FACTOR}_base{BASE_PIXEL_SIZE!r}")
+    cache = TileCache(CACHE_MAX_BYTES, spill_dir)
+    renderer = ParallelRenderer() if USE_PROCESSES else None
+    client = connect_tile_server() if TILE_SERVER is not None else None
+    fetcher = LatestJobRunner(partial(fetch_tiles, client)) if client is not None else None
+    render = None  # Progressive render of the current view
+
+    # Stage timings, and the tile throughput (in tiles of TILE_SIZE^2 computed pixels) behind the ETA
+    instruments = Instrumentation(trace_filename=TIMING_TRACE)
+    overlay_font = pygame.font.SysFont(None, 22)
+    show_timings = SHOW_TIMINGS
+    tile_pixels = TILE_SIZE * TILE_SIZE
+    throughput = ThroughputEta()
+    tile_rate = None  # Tiles per second of the last finished render
+
+    # Timing overlay with the live tile rate and the ETA of the current render
+    def draw_overlay():
+        if not show_timings:
+            return
+        rate = throughput.rate if not render.done else tile_rate
+        lines = [f"tiles/s  {rate:.1f}" if rate else "tiles/s  -"]
+        if not render.done:
+            eta = throughput.eta(render.remaining / tile_pixels)
+            lines.append(f"ETA      {eta:.2f} s" if eta is not None else "ETA      -")
+        instruments.draw_overlay(screen, overlay_font, extra_lines=lines)
 
     running = True
-    eta = 0
     while running:
-        start_time = time.time()  # Start timing for the render
+        # Wait for input when there is nothing left to render
+        rendering = render is None or not render.done
+        events = pygame.event.get() if rendering else [pygame.event.wait()] + pygame.event.get()
+        instruments.restart_frame()
 
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
             elif event.type == pygame.MOUSEBUTTONDOWN:
+                mouse_x, mouse_y = event.pos
                 if event.button == 1:  # Left click
-                    mouse_x, mouse_y = event.pos
-
                     # Check if the "Save" button was clicked
                     if SAVE_BUTTON_RECT.collidepoint(mouse_x, mouse_y):
                         save_image(screen)  # Save the current fractal view
-                    else:
-                        # Zoom in on mouse click
-                        zoom_x = x_min + (mouse_x / WIDTH) * (x_max - x_min)
-                        zoom_y = y_min + (mouse_y / HEIGHT) * (y_max - y_min)
+                    elif level < MAX_LEVEL:
+                        # Zoom in on mouse click: the clicked pixel becomes the center
+                        history.append((level, px0, py0))
+                        level += 1
+                        px0 = (px0 + mouse_x) * ZOOM_FACTOR - WIDTH // 2
+                        py0 = (py0 + mouse_y) * ZOOM_FACTOR - HEIGHT // 2
+                elif event.button == 3 and level > 0:  # Right click zooms back out
+                    history.append((level, px0, py0))
+                    level -= 1
+                    px0 = (px0 + mouse_x) // ZOOM_FACTOR - WIDTH // 2
+                    py0 = (py0 + mouse_y) // ZOOM_FACTOR - HEIGHT // 2
+            elif event.type == pygame.KEYDOWN:
+                # Arrow keys re-center the view, Backspace returns to the previous one
+                pan = {pygame.K_LEFT: (-PAN_STEP, 0), pygame.K_RIGHT: (PAN_STEP, 0),
+                       pygame.K_UP: (0, -PAN_STEP), pygame.K_DOWN: (0, PAN_STEP)}.get(event.key)
+                if pan is not None:
+                    history.append((level, px0, py0))
+                    px0, py0 = px0 + pan[0], py0 + pan[1]
+                elif event.key == pygame.K_BACKSPACE and history:
+                    level, px0, py0 = history.pop()
+                elif event.key == pygame.K_F3:
+                    show_timings = not show_timings
+
+        if not running:
+            break
+
+        # Tiles from the server go into the cache and, when they belong to it, the current render
+        fetched = fetcher.poll() if fetcher is not None else None
+        if fetched is not None:
+            if fetched[1] is None:
+                client.close()
+                client = None
+            else:
+                for key, tile in fetched[1]:
+                    cache.put(key, tile)
+                    if render is not None and not render.done and key[0] == render.level \
+                            and key[1:] in render.tiles:
+                        render.add_tile(key[1], key[2], tile)
+
+        # Start over when the view changed; otherwise resume an interrupted render
+        if render is None or (render.level, render.px0, render.py0) != (level, px0, py0):
+            render = start_render(cache, level, px0, py0, renderer)
+            if client is not None and level <= client.max_level:
+                # The server's tiles arrive in the background while the local passes run
+                missing = [(level, tx, ty) for tx, ty in render.tiles if (level, tx, ty) not in cache]
+                if missing:
+                    fetcher.submit(missing)
+            throughput.start()
+            start_time = time.time()  # Start timing for the render
 
-                        # Update bounds to zoom
-                        zoom_width = (x_max - x_min) / ZOOM_FACTOR
-                        zoom_height = (y_max - y_min) / ZOOM_FACTOR
+        if not render.done:
+            # Show each pass as soon as it is finished
+            def show_pass(counts, stride):
+                throughput.update(render.computed / tile_pixels)
+                with instruments.stage("rasterize"):
+                    pixels = PALETTE[counts]
+                with instruments.stage("blit"):
+                    pygame.surfarray.blit_array(fractal, pixels)
+                    screen.blit(fractal, (0, 0))
+                    draw_save_button(screen)
+                    draw_overlay()
+                with instruments.stage("flip"):
+                    pygame.display.update()
 
-                        x_min, x_max = zoom_x - zoom_width / 2, zoom_x + zoom_width / 2
-                        y_min, y_max = zoom_y - zoom_height / 2, zoom_y + zoom_height / 2
+            with instruments.stage("compute"):
+                finished = render.run(render_interrupted, show_pass)
+            if finished:
+                # The next view (a zoom or pan) needs about as many new tiles as this one
+                render_time = time.time() - start_time
+                tile_rate = throughput.rate or tile_rate
+                eta = len(render.tiles) / tile_rate if tile_rate else 0.0
+                print(f"Render completed in {render_time:.2f} seconds ({cache.hits} tile hits, {cache.misses} misses, "
+                      f"{cache.bytes / 2**20:.1f} MB cached). Estimated time for next render: {eta:.2f} seconds "
+                      f"at {tile_rate or 0:.1f} tiles/s.")
+                if render.kernel is not None:
+                    center_re, center_im = render.kernel.point(WIDTH // 2, HEIGHT // 2)
+                    print(f"Deep view (level {level}, {len(render.kernel.references)} reference orbits): "
+                          f"center {center_re} + {center_im}i, pixel size "
+                          f"{level_pixel_size(BASE_PIXEL_SIZE, ZOOM_FACTOR, level):.3e}")
+                else:
+                    x_min, x_max, y_min, y_max = view_bounds(level, px0, py0)
+                    print(f"View: re [{x_min!r}, {x_max!r}], im [{y_min!r}, {y_max!r}]")
 
-                        cache.clear()  # Clear cache since we're recalculating
+        with instruments.stage("blit"):
+            screen.blit(fractal, (0, 0))
 
-        # Render the fractal
-        render_fractal(screen, x_min, x_max, y_min, y_max, cache)
-        
-        # Draw the save button
-        draw_save_button(screen)
+            # Draw the save button
+            draw_save_button(screen)
+            draw_overlay()
 
-        # Calculate and display ETA
-        render_time = time.time() - start_time
-        eta = render_time * ZOOM_FACTOR  # Basic approximation of next render time
-        print(f"Render completed in {render_time:.2f} seconds. Estimated time for next render: {eta:.2f} seconds.")
-        
-        pygame.display.update()
+        with instruments.stage("flip"):
+            pygame.display.update()
+        instruments.end_frame()
 
+    if renderer is not None:
+        renderer.close()
+    if fetcher is not None:
+        fetcher.close()
+    if client is not None:
+        client.close()
+    instruments.close()
     pygame.quit()
 
 if __name__ == "__main__":
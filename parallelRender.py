@@ -0,0 +1,150 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from escapeTime import escape_time
+
+DEFAULT_BAND_HEIGHT = 16  # Rows per task; small bands keep all cores busy near the set boundary
+
+
+# Worker: compute one block of escape-time counts and write it straight into the
+# shared output array, so nothing but the block index travels back to the parent
+def _render_block(shm_name, shape, out_dtype, index, re, im, max_iter, complex_dtype):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=out_dtype, buffer=shm.buf)
+        c = re[np.newaxis, :] + 1j * im[:, np.newaxis]
+        out[index] = escape_time(c, max_iter, dtype=complex_dtype)
+        del out
+    finally:
+        shm.close()
+    return index
+
+
+# Worker: escape-time counts of an arbitrary slice of points, written into the
+# shared flat output array
+def _render_points(shm_name, size, out_dtype, start, points, max_iter, complex_dtype):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray((size,), dtype=out_dtype, buffer=shm.buf)
+        out[start:start + points.size] = escape_time(points, max_iter, dtype=complex_dtype)
+        del out
+    finally:
+        shm.close()
+    return start
+
+
+# Real/imaginary sample axes of a grid: linspace including both ends (as in
+# mandelbrot.py) or x_min + j * step excluding the end (as in the C renderer)
+def grid_axes(x_min, x_max, y_min, y_max, width, height, endpoint=False):
+    if endpoint:
+        return np.linspace(x_min, x_max, width), np.linspace(y_min, y_max, height)
+    return (x_min + np.arange(width) * ((x_max - x_min) / width),
+            y_min + np.arange(height) * ((y_max - y_min) / height))
+
+
+# Process pool that renders escape-time grids in row bands or tiles. Blocks are
+# submitted as many small tasks so the executor hands them out dynamically,
+# and every worker writes into one multiprocessing.shared_memory array.
+class ParallelRenderer:
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Run tasks (index, re, im) against a fresh shared array of the given shape and return a copy
+    def _run(self, shape, out_dtype, tasks, max_iter, complex_dtype, progress):
+        out_dtype = np.dtype(out_dtype)
+        nbytes = max(int(np.prod(shape)) * out_dtype.itemsize, 1)
+        shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        try:
+            futures = [self._executor.submit(_render_block, shm.name, shape, out_dtype, index, re, im,
+                                             max_iter, complex_dtype)
+                       for index, re, im in tasks]
+            for done, future in enumerate(as_completed(futures), 1):
+                future.result()
+                if progress is not None:
+                    progress(done, len(futures))
+            shared = np.ndarray(shape, dtype=out_dtype, buffer=shm.buf)
+            result = shared.copy()
+            del shared
+            return result
+        finally:
+            shm.close()
+            shm.unlink()
+
+    # Render a height x width grid (rows = imaginary axis) in bands of band_height rows
+    def render(self, x_min, x_max, y_min, y_max, width, height, max_iter, endpoint=False,
+               band_height=DEFAULT_BAND_HEIGHT, out_dtype=np.uint32, complex_dtype=np.complex128,
+               progress=None):
+        re, im = grid_axes(x_min, x_max, y_min, y_max, width, height, endpoint)
+        return self.render_axes(re, im, max_iter, band_height, out_dtype, complex_dtype, progress)
+
+    # Render the (len(im), len(re)) grid of the given sample axes, e.g. one band
+    # of a larger image
+    def render_axes(self, re, im, max_iter, band_height=DEFAULT_BAND_HEIGHT, out_dtype=np.uint32,
+                    complex_dtype=np.complex128, progress=None):
+        height, width = len(im), len(re)
+        tasks = [(slice(y0, min(y0 + band_height, height)), re, im[y0:y0 + band_height])
+                 for y0 in range(0, height, band_height)]
+        return self._run((height, width), out_dtype, tasks, max_iter, complex_dtype, progress)
+
+    # Render a list of tiles given as (re axis, im axis) pairs of equal size;
+    # each result is indexed [x, y] like pygame's surfarray
+    def render_tiles(self, tile_axes, max_iter, out_dtype=np.uint16, complex_dtype=np.complex128,
+                     progress=None):
+        if not tile_axes:
+            return []
+        tile_width, tile_height = len(tile_axes[0][0]), len(tile_axes[0][1])
+        tasks = [(i, re, im) for i, (re, im) in enumerate(tile_axes)]
+        blocks = self._run((len(tile_axes), tile_height, tile_width), out_dtype, tasks, max_iter,
+                           complex_dtype, progress)
+        return [np.ascontiguousarray(block.T) for block in blocks]
+
+    # Render a flat array of arbitrary points in chunks. should_abort() is polled
+    # while waiting; when it returns True the pending chunks are cancelled and
+    # None is returned instead of the counts
+    def render_points(self, points, max_iter, chunk_size=32768, out_dtype=np.uint16,
+                      complex_dtype=np.complex128, should_abort=None):
+        points = np.ascontiguousarray(points).ravel()
+        out_dtype = np.dtype(out_dtype)
+        if points.size == 0:
+            return np.empty(0, dtype=out_dtype)
+        shm = shared_memory.SharedMemory(create=True, size=points.size * out_dtype.itemsize)
+        try:
+            pending = {self._executor.submit(_render_points, shm.name, points.size, out_dtype, start,
+                                             points[start:start + chunk_size], max_iter, complex_dtype)
+                       for start in range(0, points.size, chunk_size)}
+            while pending:
+                done, pending = wait(pending, timeout=0.01, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                if pending and should_abort is not None and should_abort():
+                    for future in pending:
+                        future.cancel()
+                    # Chunks already running still write into the segment; let them finish first
+                    wait(pending)
+                    return None
+            shared = np.ndarray((points.size,), dtype=out_dtype, buffer=shm.buf)
+            result = shared.copy()
+            del shared
+            return result
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+# One-shot helper: render a grid on all cores and shut the pool down again
+def render_parallel(x_min, x_max, y_min, y_max, width, height, max_iter, workers=None, **options):
+    with ParallelRenderer(workers) as renderer:
+        return renderer.render(x_min, x_max, y_min, y_max, width, height, max_iter, **options)
@@ -0,0 +1,151 @@
+import math
+from decimal import Decimal, localcontext
+
+import numpy as np
+
+from tileCache import level_pixel_size
+
+# Deep zoom by perturbation: one reference orbit Z_n is iterated in arbitrary
+# precision (decimal) and every other pixel only tracks its float64 difference
+# dz_n = z_n - Z_n, which obeys dz_{n+1} = 2 Z_n dz_n + dz_n^2 + dc with dc the
+# pixel's offset from the reference point. dc stays representable however deep
+# the zoom, so the per-pixel cost is that of an ordinary float64 iteration.
+# When |z_n| becomes tiny compared with |Z_n| the difference has lost its
+# precision (a "glitch", Pauldelbrot's criterion); such pixels, and pixels that
+# outlive an escaped reference, are recomputed against a new reference orbit
+# taken at one of them.
+GLITCH_TOLERANCE = 1e-6  # Squared |z| / |Z| ratio below which a pixel is glitched
+DEFAULT_MAX_REFERENCES = 16  # Reference orbits per view before glitches are left as they are
+EXTRA_DIGITS = 20  # Decimal digits beyond those needed to resolve one pixel
+
+
+# Decimal digits needed to tell neighbouring pixels of a zoom level apart
+def lattice_precision(pixel_size):
+    return max(-math.floor(math.log10(pixel_size)), 0) + EXTRA_DIGITS
+
+
+# Exact coordinate of global pixel index g at a zoom level, as a Decimal
+def lattice_value(g, base_pixel_size, zoom_factor, level):
+    precision = lattice_precision(level_pixel_size(base_pixel_size, zoom_factor, level))
+    with localcontext() as context:
+        context.prec = precision
+        return Decimal(int(g)) * Decimal(base_pixel_size) / Decimal(zoom_factor) ** level
+
+
+# Reference orbit Z_0 = 0, Z_1, ... of c = c_re + i c_im iterated in Decimal
+# arithmetic and rounded to complex128. It stops after max_iter values or at
+# the first |Z_n| > 2, which is included.
+def reference_orbit(c_re, c_im, max_iter, precision):
+    orbit = np.empty(max_iter, dtype=np.complex128)
+    with localcontext() as context:
+        context.prec = precision
+        z_re, z_im = Decimal(0), Decimal(0)
+        for n in range(max_iter):
+            orbit[n] = complex(float(z_re), float(z_im))
+            re_squared, im_squared = z_re * z_re, z_im * z_im
+            if re_squared + im_squared > 4:
+                return orbit[:n + 1]
+            z_re, z_im = re_squared - im_squared + c_re, 2 * z_re * z_im + c_im
+    return orbit
+
+
+# Escape-time counts of the points reference + delta_c, iterated as float64
+# perturbations of the reference orbit with the same compacted active set as
+# escape_time(). Returns (counts, glitched); glitched pixels need another reference.
+def perturbed_escape_time(orbit, delta_c, max_iter, glitch_tolerance=GLITCH_TOLERANCE):
+    delta_c = np.asarray(delta_c, dtype=np.complex128).ravel()
+    counts = np.full(delta_c.size, max_iter, dtype=np.int32)
+    glitched = np.zeros(delta_c.size, dtype=bool)
+    reference_magnitude = orbit.real * orbit.real + orbit.imag * orbit.imag
+
+    index = np.arange(delta_c.size)
+    dc = delta_c.copy()
+    dz = np.zeros_like(dc)
+    z = np.empty_like(dc)
+    magnitude = np.empty(dc.size)
+    scratch = np.empty(dc.size)
+
+    for n in range(max_iter):
+        if index.size == 0:
+            break
+        if n == orbit.size:
+            # The reference escaped while these pixels are still bounded
+            glitched[index] = True
+            break
+
+        np.add(dz, orbit[n], out=z)
+        np.multiply(z.real, z.real, out=magnitude)
+        np.multiply(z.imag, z.imag, out=scratch)
+        magnitude += scratch
+        finished = magnitude > 4.0
+        counts[index[finished]] = n
+        glitch = magnitude < glitch_tolerance * reference_magnitude[n]
+        glitch &= ~finished
+        glitched[index[glitch]] = True
+        finished |= glitch
+
+        if finished.any():
+            active = ~finished
+            index, dc, dz = index[active], dc[active], dz[active]
+            z, magnitude, scratch = z[:index.size], magnitude[:index.size], scratch[:index.size]
+
+        # dz <- dz * (2 Z_n + dz) + dc, in place
+        np.add(dz, 2 * orbit[n], out=z)
+        dz *= z
+        dz += dc
+
+    return counts, glitched
+
+
+# Escape-time kernel for one deep view. Pixels are given as integer offsets
+# (dx, dy) from the view's top-left global pixel (px0, py0), so nothing larger
+# than the view ever passes through float64; the first reference is the view centre.
+class PerturbationKernel:
+    def __init__(self, base_pixel_size, zoom_factor, level, px0, py0, width, height, max_iter,
+                 max_references=DEFAULT_MAX_REFERENCES, glitch_tolerance=GLITCH_TOLERANCE):
+        self.base_pixel_size = base_pixel_size
+        self.zoom_factor = zoom_factor
+        self.level = level
+        self.px0, self.py0 = px0, py0
+        self.max_iter = max_iter
+        self.max_references = max_references
+        self.glitch_tolerance = glitch_tolerance
+        self.pixel_size = level_pixel_size(base_pixel_size, zoom_factor, level)
+        self.precision = lattice_precision(self.pixel_size)
+        self.references = []  # (dx, dy, orbit) of every reference made so far
+        self._add_reference(width // 2, height // 2)
+
+    # Exact complex coordinate of the pixel at offset (dx, dy), as two Decimals
+    def point(self, dx, dy):
+        return (lattice_value(self.px0 + dx, self.base_pixel_size, self.zoom_factor, self.level),
+                lattice_value(self.py0 + dy, self.base_pixel_size, self.zoom_factor, self.level))
+
+    def _add_reference(self, dx, dy):
+        orbit = reference_orbit(*self.point(dx, dy), self.max_iter, self.precision)
+        self.references.append((dx, dy, orbit))
+
+    # Counts of the pixels at offsets (dx, dy). Glitched pixels are retried with
+    # the other references, and a new one is made at the glitched pixel nearest
+    # their centroid while the reference budget lasts.
+    def __call__(self, dx, dy):
+        dx = np.asarray(dx, dtype=np.int64).ravel()
+        dy = np.asarray(dy, dtype=np.int64).ravel()
+        counts = np.full(dx.size, self.max_iter, dtype=np.int32)
+        pending = np.arange(dx.size)
+
+        attempt = 0
+        while pending.size:
+            if attempt == len(self.references):
+                if attempt == self.max_references:
+                    break
+                centre_x, centre_y = dx[pending].mean(), dy[pending].mean()
+                nearest = pending[np.argmin((dx[pending] - centre_x) ** 2 + (dy[pending] - centre_y) ** 2)]
+                self._add_reference(int(dx[nearest]), int(dy[nearest]))
+            ref_x, ref_y, orbit = self.references[attempt]
+            delta_c = ((dx[pending] - ref_x) + 1j * (dy[pending] - ref_y)) * self.pixel_size
+            pending_counts, glitched = perturbed_escape_time(orbit, delta_c, self.max_iter,
+                                                             self.glitch_tolerance)
+            counts[pending] = pending_counts
+            pending = pending[glitched]
+            attempt += 1
+        return counts
@@ -1,22 +1,19 @@
-import numpy as np
-import matplotlib.pyplot as plt
+import os
+from parallelRender import render_parallel
+from gridFile import BOUND_KEYS, import_text_grid, load_grid, mismatched_parameters, save_grid
+from posterRender import counts_to_png, render_poster
 
-def load_mandelbrot_data(filename):
-    params = {}
-    
-    with open(filename, 'r') as file:
-        # Read the image data
-        data = []
-        for line in file:
-            line = line.strip()  # Remove whitespace
-            if line:  # Only process non-empty lines
-                try:
-                    data.append(list(map(int, line.split())))
-                except ValueError:
-                    print(f"Warning: Data line is not valid: '{line}'")
-                    continue  # Skip lines that can't be converted
-
-    return np.array(data)
+# Load the Mandelbrot grid as a zero-copy memory map, returning (counts, header).
+# Binary .grid files are used directly; a legacy text file is converted once into
+# a .grid next to it (bounds taken from params, as the text has none)
+def load_mandelbrot_data(filename, params=None):
+    if filename.endswith('.txt'):
+        grid_filename = filename[:-len('.txt')] + '.grid'
+        if not os.path.exists(grid_filename) or os.path.getmtime(grid_filename) < os.path.getmtime(filename):
+            bounds = [params[key] for key in BOUND_KEYS]
+            import_text_grid(filename, grid_filename, bounds)
+        filename = grid_filename
+    return load_grid(filename)
 
 def load_parameters(filename):
     params = {}
@@ -31,20 +28,54 @@ def load_parameters(filename):
     
     return params
 
-# Load parameters and the Mandelbrot data
-params = load_parameters('config.txt')
-mandelbrot_image = load_mandelbrot_data('mandelbrot_data.txt')
+# Render the grid described by the parameters on all cores instead of reading
+# the C program's output; uses the C program's grid and max_iter = height / 5
+def render_mandelbrot_data(params):
+    return render_parallel(params['X_min'], params['X_max'], params['Y_min'], params['Y_max'],
+                           params['Width'], params['Height'], params['Height'] // 5)
+
+if __name__ == "__main__":
+    render_in_python = False  # Render the config.txt grid here instead of loading the C output
+    streaming_png = True  # Color the grid band by band into a full-resolution PNG (memory bounded by the band size)
+    save_figure = False  # Also draw the matplotlib figure with axes and colorbar (loads the whole grid)
+    data_filename = 'mandelbrot_data.grid' if os.path.exists('mandelbrot_data.grid') else 'mandelbrot_data.txt'
+
+    # Load parameters and the Mandelbrot data
+    params = load_parameters('config.txt')
+    if render_in_python:
+        bounds = [params[key] for key in BOUND_KEYS]
+        if streaming_png:
+            # Compute, color and write band by band; the counts reach the grid file through a memory map
+            render_poster('mandelbrot_set_dynamic.png', *bounds, params['Width'], params['Height'],
+                          params['Height'] // 5, colormap='hot', grid_filename='mandelbrot_data.grid')
+        else:
+            save_grid('mandelbrot_data.grid', render_mandelbrot_data(params), bounds, params['Height'] // 5)
+        data_filename = 'mandelbrot_data.grid'
+
+    mandelbrot_image, header = load_mandelbrot_data(data_filename, params)
+    # The grid header is authoritative; report where config.txt disagrees with it
+    for mismatch in mismatched_parameters(header, params):
+        print(f"Warning: config.txt has {mismatch}")
+    params.update(header)
+
+    if streaming_png and not render_in_python:
+        # One pixel per grid cell, read from the memory map one band at a time
+        counts_to_png(mandelbrot_image, 'mandelbrot_set_dynamic.png', header['max_iter'], colormap='hot')
+
+    if save_figure:
+        import matplotlib.pyplot as plt
 
-# Create the plot with high quality
-plt.figure(figsize=(10, 10), dpi=300)
-plt.imshow(mandelbrot_image, extent=(params['X_min'], params['X_max'], params['Y_min'], params['Y_max']), cmap='hot', interpolation='bilinear')
-plt.colorbar()
-plt.title('Mandelbrot Set')
-plt.xlabel('Real')
-plt.ylabel('Imaginary')
+        # Create the plot with high quality
+        plt.figure(figsize=(10, 10), dpi=300)
+        plt.imshow(mandelbrot_image, extent=(params['X_min'], params['X_max'], params['Y_min'], params['Y_max']), cmap='hot', interpolation='bilinear')
+        plt.colorbar()
+        plt.title('Mandelbrot Set')
+        plt.xlabel('Real')
+        plt.ylabel('Imaginary')
 
-# Save as PNG and PDF with high DPI and no compression
-plt.savefig('mandelbrot_set_dynamic.png', format='png', dpi=600)
-plt.savefig('mandelbrot_set_dynamic.pdf', format='pdf', dpi=600)
+        # Save as PNG and PDF with high DPI and no compression
+        if not streaming_png:
+            plt.savefig('mandelbrot_set_dynamic.png', format='png', dpi=600)
+        plt.savefig('mandelbrot_set_dynamic.pdf', format='pdf', dpi=600)
 
-plt.show()
+        plt.show()
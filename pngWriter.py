@@ -0,0 +1,118 @@
+import struct
+import zlib
+
+import numpy as np
+
+# Minimal PNG encoder (8-bit grayscale or RGB, no filtering) built on zlib, so
+# headless renders can be written without pygame or matplotlib. PngWriter takes
+# the image a band of rows at a time and compresses them as they arrive, so an
+# image of any height is written with memory bounded by the band size.
+COLOR_TYPES = {1: 0, 3: 2}  # Channels -> PNG color type (grayscale, RGB)
+DEFAULT_COMPRESSION = 6
+DEFAULT_IDAT_BYTES = 1 << 20  # Compressed bytes collected before an IDAT chunk is written
+
+
+def _chunk(kind, data):
+    return (struct.pack(">I", len(data)) + kind + data +
+            struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+
+# PNG signature and IHDR chunk of an 8-bit image
+def _header(width, height, channels):
+    if channels not in COLOR_TYPES:
+        raise ValueError(f"PNG images need 1 or 3 channels, got {channels}")
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, COLOR_TYPES[channels], 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + _chunk(b"IHDR", ihdr)
+
+
+# Scanlines of a (rows, width, channels) uint8 band, each prefixed with its filter type byte (0 = none)
+def _scanlines(pixels):
+    rows = np.zeros((pixels.shape[0], 1 + pixels.shape[1] * pixels.shape[2]), dtype=np.uint8)
+    rows[:, 1:] = pixels.reshape(pixels.shape[0], -1)
+    return rows
+
+
+# Incremental PNG file: write_rows() appends scanlines top to bottom, close()
+# checks that all `height` rows arrived and finishes the file
+class PngWriter:
+    def __init__(self, filename, width, height, channels=3, compression=DEFAULT_COMPRESSION,
+                 idat_bytes=DEFAULT_IDAT_BYTES):
+        header = _header(width, height, channels)
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.rows_written = 0
+        self.idat_bytes = idat_bytes
+        self._compressor = zlib.compressobj(compression)
+        self._pending = []
+        self._pending_size = 0
+        self._file = open(filename, "wb")
+        self._file.write(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # Append a (rows, width) or (rows, width, 3) uint8 band below the rows written so far
+    def write_rows(self, pixels):
+        pixels = np.asarray(pixels)
+        if pixels.dtype != np.uint8:
+            raise ValueError(f"PNG pixels must be uint8, got {pixels.dtype}")
+        if pixels.ndim == 2:
+            pixels = pixels[:, :, np.newaxis]
+        if pixels.shape[1:] != (self.width, self.channels):
+            raise ValueError(f"Expected rows of shape ({self.width}, {self.channels}), got {pixels.shape[1:]}")
+        if self.rows_written + pixels.shape[0] > self.height:
+            raise ValueError(f"Image has only {self.height} rows")
+
+        self._append(self._compressor.compress(_scanlines(pixels)))
+        self.rows_written += pixels.shape[0]
+
+    def _append(self, data, final=False):
+        if data:
+            self._pending.append(data)
+            self._pending_size += len(data)
+        if self._pending_size >= self.idat_bytes or (final and self._pending):
+            self._file.write(_chunk(b"IDAT", b"".join(self._pending)))
+            self._pending = []
+            self._pending_size = 0
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"PNG closed after {self.rows_written} of {self.height} rows")
+            self._append(self._compressor.flush(), final=True)
+            self._file.write(_chunk(b"IEND", b""))
+        finally:
+            self._file.close()
+            self._file = None
+
+
+# Write a (height, width) or (height, width, 3) uint8 image as a PNG file
+def write_png(filename, pixels, compression=DEFAULT_COMPRESSION):
+    pixels = np.asarray(pixels)
+    channels = 1 if pixels.ndim == 2 else pixels.shape[-1]
+    with PngWriter(filename, pixels.shape[1], pixels.shape[0], channels, compression) as writer:
+        writer.write_rows(pixels)
+
+
+# Encode a (height, width) or (height, width, 3) uint8 image as PNG bytes in
+# memory (e.g. a tile sent over HTTP)
+def encode_png(pixels, compression=DEFAULT_COMPRESSION):
+    pixels = np.asarray(pixels)
+    if pixels.dtype != np.uint8:
+        raise ValueError(f"PNG pixels must be uint8, got {pixels.dtype}")
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, np.newaxis]
+    height, width, channels = pixels.shape
+    return b"".join((_header(width, height, channels),
+                     _chunk(b"IDAT", zlib.compress(_scanlines(pixels), compression)),
+                     _chunk(b"IEND", b"")))
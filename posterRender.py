@@ -0,0 +1,125 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from arrayFile import read_rows
+from chaosCore import build_palette
+from escapeTime import escape_time
+from gridFile import count_dtype, create_grid, load_grid
+from parallelRender import ParallelRenderer, grid_axes
+from pngWriter import DEFAULT_COMPRESSION, PngWriter
+
+# Out-of-core Mandelbrot posters: the grid is computed (or read from a mapped
+# .grid file) one band of rows at a time, every band is colored through a
+# lookup table indexed by iteration count, and its scanlines go straight into a
+# streaming PNG. Only two bands are alive at once, so memory stays a small
+# multiple of band_bytes whatever the image size. Compression of one band runs on a
+# writer thread (zlib releases the GIL) while the next band is computed.
+# Images have y_max at the top; grid rows are stored from y_min upwards.
+DEFAULT_BAND_BYTES = 64 * 2**20  # Counts plus RGB pixels of one band
+
+
+# (max_iter + 1, 3) uint8 colors indexed by iteration count: 'bands' is the zoom
+# viewer's palette, any other name a matplotlib colormap spread over 0..max_iter
+def colormap_lut(name, max_iter):
+    if name == "bands":
+        return build_palette(max_iter)
+    import matplotlib
+
+    colors = matplotlib.colormaps[name](np.linspace(0.0, 1.0, max_iter + 1))[:, :3]
+    return np.clip(colors * 255 + 0.5, 0, 255).astype(np.uint8)
+
+
+# Rows per band so that one band of counts and RGB pixels fits in band_bytes
+def band_rows(width, max_iter, band_bytes=DEFAULT_BAND_BYTES):
+    bytes_per_row = width * (np.dtype(count_dtype(max_iter)).itemsize + 3)
+    return max(1, band_bytes // bytes_per_row)
+
+
+# Bands of a (height, width) grid from the top of the image (last grid row) down,
+# each flipped to image order; a mapped grid is read band by band from its file
+def grid_bands(counts, rows):
+    height = counts.shape[0]
+    for stop in range(height, 0, -rows):
+        yield read_rows(counts, max(stop - rows, 0), stop)[::-1]
+
+
+# Compute a grid band by band in image order. Each band is rendered on the
+# process pool when a renderer is given (in-process otherwise) and, with `grid`
+# (a writable (height, width) array such as a mapped grid file), stored there too
+def computed_bands(x_min, x_max, y_min, y_max, width, height, max_iter, rows, renderer=None,
+                   endpoint=False, complex_dtype=np.complex128, grid=None):
+    re, im = grid_axes(x_min, x_max, y_min, y_max, width, height, endpoint)
+    out_dtype = count_dtype(max_iter)
+    for stop in range(height, 0, -rows):
+        start = max(stop - rows, 0)
+        band_im = im[start:stop][::-1]
+        if renderer is not None:
+            band = renderer.render_axes(re, band_im, max_iter, out_dtype=out_dtype, complex_dtype=complex_dtype)
+        else:
+            band = escape_time(re[np.newaxis, :] + 1j * band_im[:, np.newaxis], max_iter,
+                               dtype=complex_dtype).astype(out_dtype)
+        if grid is not None:
+            grid[start:stop] = band[::-1]
+        yield band
+
+
+# Color bands of counts through `lut` and stream them into a width x height PNG.
+# progress(rows_done, height) is called after each band is handed to the writer
+def write_bands(filename, width, height, bands, lut, compression=DEFAULT_COMPRESSION, progress=None):
+    lut = np.asarray(lut, dtype=np.uint8)
+    done = 0
+    with PngWriter(filename, width, height, 3, compression) as writer, \
+            ThreadPoolExecutor(max_workers=1) as encoder:
+        pending = None
+        for band in bands:
+            pixels = lut[band]
+            # Keep at most one band waiting on the encoder
+            if pending is not None:
+                pending.result()
+            pending = encoder.submit(writer.write_rows, pixels)
+            done += band.shape[0]
+            if progress is not None:
+                progress(done, height)
+        if pending is not None:
+            pending.result()
+
+
+# Write a (height, width) count grid (e.g. a mapped grid file, rows from y_min
+# upwards) to a PNG one band at a time: one color per count, no resampling
+def counts_to_png(counts, png_filename, max_iter, colormap="hot", band_bytes=DEFAULT_BAND_BYTES,
+                  compression=DEFAULT_COMPRESSION, progress=None):
+    height, width = counts.shape
+    write_bands(png_filename, width, height, grid_bands(counts, band_rows(width, max_iter, band_bytes)),
+                colormap_lut(colormap, max_iter), compression, progress)
+
+
+# Convert a grid file to a PNG without loading it
+def grid_to_png(grid_filename, png_filename, colormap="hot", band_bytes=DEFAULT_BAND_BYTES,
+                compression=DEFAULT_COMPRESSION, progress=None):
+    counts, metadata = load_grid(grid_filename)
+    counts_to_png(counts, png_filename, metadata["max_iter"], colormap, band_bytes, compression, progress)
+    return metadata
+
+
+# Render a Mandelbrot poster straight to PNG; grid_filename also keeps the
+# counts as a .grid file (written through a memory map, so still out of core).
+# workers=1 computes in this process, anything else on a process pool
+def render_poster(png_filename, x_min, x_max, y_min, y_max, width, height, max_iter, colormap="hot",
+                  band_bytes=DEFAULT_BAND_BYTES, endpoint=False, complex_dtype=np.complex128, workers=None,
+                  grid_filename=None, compression=DEFAULT_COMPRESSION, progress=None):
+    lut = colormap_lut(colormap, max_iter)
+    rows = band_rows(width, max_iter, band_bytes)
+    grid = None
+    if grid_filename is not None:
+        grid = create_grid(grid_filename, width, height, (x_min, x_max, y_min, y_max), max_iter)
+    renderer = ParallelRenderer(workers) if workers != 1 else None
+    try:
+        bands = computed_bands(x_min, x_max, y_min, y_max, width, height, max_iter, rows, renderer,
+                               endpoint, complex_dtype, grid)
+        write_bands(png_filename, width, height, bands, lut, compression, progress)
+    finally:
+        if renderer is not None:
+            renderer.close()
+        if isinstance(grid, np.memmap):
+            grid.flush()
@@ -0,0 +1,141 @@
+import numpy as np
+
+from escapeTime import escape_time
+from gridFile import count_dtype
+from tileCache import tiles_for_view
+
+PASS_STRIDES = (8, 4, 2, 1)  # 1/8, 1/4, 1/2 and full resolution
+DEFAULT_CHUNK_SIZE = 32768  # Points between abort checks
+
+
+# Progressive, interruptible render of one view. The iteration counts are kept
+# for the tile-aligned region around the view; each pass samples every
+# stride-th pixel of that region, skipping pixels an earlier pass (or the tile
+# cache) already knows, so later passes reuse everything computed before them.
+# run() returns False when should_abort() fires and can be called again later
+# to resume where it stopped. Completed renders store their tiles in the cache.
+# Points come from axes(level, gx0, gy0, width, height), which gives the sample
+# axes of a global pixel block; alternatively kernel(dx, dy) computes the counts
+# of pixels at integer offsets from (px0, py0) itself (e.g. a deep-zoom kernel).
+class ProgressiveRender:
+    def __init__(self, cache, level, px0, py0, width, height, tile_size, max_iter, axes=None,
+                 renderer=None, chunk_size=DEFAULT_CHUNK_SIZE, kernel=None):
+        self.cache = cache
+        self.level = level
+        self.px0, self.py0 = px0, py0
+        self.width, self.height = width, height
+        self.tile_size = tile_size
+        self.max_iter = max_iter
+        self.renderer = renderer
+        self.chunk_size = chunk_size
+        self.kernel = kernel
+        self.pass_index = 0
+        self.done = False
+        self.computed = 0  # Pixels computed by this render so far (not taken from the cache)
+
+        # Tile-aligned region covering the view
+        self.tiles = tiles_for_view(px0, py0, width, height, tile_size)
+        self.rx0 = min(tx for tx, _ in self.tiles) * tile_size
+        self.ry0 = min(ty for _, ty in self.tiles) * tile_size
+        region_width = (max(tx for tx, _ in self.tiles) + 1) * tile_size - self.rx0
+        region_height = (max(ty for _, ty in self.tiles) + 1) * tile_size - self.ry0
+        if kernel is None:
+            self.re, self.im = axes(level, self.rx0, self.ry0, region_width, region_height)
+        self.counts = np.zeros((region_width, region_height), dtype=count_dtype(max_iter))
+        self.known = np.zeros((region_width, region_height), dtype=bool)
+
+        # Start from whatever the cache already has
+        for tx, ty in self.tiles:
+            tile = cache.get((level, tx, ty))
+            if tile is not None:
+                self.add_tile(tx, ty, tile)
+
+    # Take the counts of a finished tile of the view from elsewhere (the cache,
+    # a tile server); later passes skip its pixels
+    def add_tile(self, tx, ty, tile):
+        x0, y0 = tx * self.tile_size - self.rx0, ty * self.tile_size - self.ry0
+        self.counts[x0:x0 + self.tile_size, y0:y0 + self.tile_size] = tile
+        self.known[x0:x0 + self.tile_size, y0:y0 + self.tile_size] = True
+
+    # Pixels of the region that are still unknown
+    @property
+    def remaining(self):
+        return int(self.known.size - np.count_nonzero(self.known))
+
+    # Stride of the finest pass completed so far (None before the first pass)
+    @property
+    def stride(self):
+        if self.pass_index == 0:
+            return None
+        return PASS_STRIDES[self.pass_index - 1]
+
+    # Run the remaining passes; on_pass(view_counts, stride) is called after each one
+    def run(self, should_abort=lambda: False, on_pass=None):
+        while self.pass_index < len(PASS_STRIDES):
+            stride = PASS_STRIDES[self.pass_index]
+            if not self._run_pass(stride, should_abort):
+                return False
+            self.pass_index += 1
+            if on_pass is not None:
+                on_pass(self.view_counts(), stride)
+
+        if not self.done:
+            for tx, ty in self.tiles:
+                x0, y0 = tx * self.tile_size - self.rx0, ty * self.tile_size - self.ry0
+                tile = self.counts[x0:x0 + self.tile_size, y0:y0 + self.tile_size].copy()
+                self.cache.put((self.level, tx, ty), tile)
+            self.done = True
+        return True
+
+    def _run_pass(self, stride, should_abort):
+        sampled = np.zeros_like(self.known)
+        sampled[::stride, ::stride] = True
+        xs, ys = np.nonzero(sampled & ~self.known)
+        if xs.size == 0:
+            return True
+
+        if self.kernel is not None:
+            ox, oy = self.rx0 - self.px0, self.ry0 - self.py0
+            return self._run_chunks(xs, ys, lambda start, stop: self.kernel(xs[start:stop] + ox,
+                                                                            ys[start:stop] + oy),
+                                    should_abort)
+
+        points = self.re[xs] + 1j * self.im[ys]
+
+        if self.renderer is not None:
+            counts = self.renderer.render_points(points, self.max_iter, self.chunk_size,
+                                                 out_dtype=self.counts.dtype, should_abort=should_abort)
+            if counts is None:
+                return False
+            self.counts[xs, ys] = counts
+            self.known[xs, ys] = True
+            self.computed += xs.size
+            return True
+
+        return self._run_chunks(xs, ys, lambda start, stop: escape_time(points[start:stop], self.max_iter),
+                                should_abort)
+
+    # Compute the pixels (xs, ys) in process, compute(start, stop) chunk by chunk
+    def _run_chunks(self, xs, ys, compute, should_abort):
+        for start in range(0, xs.size, self.chunk_size):
+            if should_abort():
+                return False
+            stop = start + self.chunk_size
+            self.counts[xs[start:stop], ys[start:stop]] = compute(start, stop)
+            # Chunks finished before an abort are kept for when the render resumes
+            self.known[xs[start:stop], ys[start:stop]] = True
+            self.computed += xs[start:stop].size
+        return True
+
+    # Counts of the visible view at the current resolution: pixels that are not
+    # known yet show the nearest sample of the finest finished pass
+    def view_counts(self):
+        ox, oy = self.px0 - self.rx0, self.py0 - self.ry0
+        exact = self.counts[ox:ox + self.width, oy:oy + self.height]
+        stride = self.stride
+        if stride is None or stride == 1:
+            return exact
+        xi = (np.arange(ox, ox + self.width) // stride) * stride
+        yi = (np.arange(oy, oy + self.height) // stride) * stride
+        coarse = self.counts[np.ix_(xi, yi)]
+        return np.where(self.known[ox:ox + self.width, oy:oy + self.height], exact, coarse)
@@ -0,0 +1,135 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+# Views are addressed on an integer pixel lattice per zoom level: at level L a
+# pixel is base_pixel_size / zoom_factor**L wide, and global pixel (gx, gy)
+# samples the point (gx * pixel_size, gy * pixel_size). Tile (L, tx, ty) holds
+# the iteration counts of global pixels [tx * T, (tx + 1) * T) x [ty * T, (ty + 1) * T),
+# indexed [x, y] like pygame's surfarray.
+
+
+# Pixel size of a zoom level
+def level_pixel_size(base_pixel_size, zoom_factor, level):
+    return base_pixel_size / zoom_factor ** level
+
+
+# Real and imaginary sample axes of a width x height block of global pixels starting at (gx0, gy0)
+def block_axes(base_pixel_size, zoom_factor, level, gx0, gy0, width, height):
+    pixel_size = level_pixel_size(base_pixel_size, zoom_factor, level)
+    re = np.arange(gx0, gx0 + width) * pixel_size
+    im = np.arange(gy0, gy0 + height) * pixel_size
+    return re, im
+
+
+# Real and imaginary sample axes of tile (level, tx, ty)
+def tile_axes(base_pixel_size, zoom_factor, level, tx, ty, tile_size):
+    return block_axes(base_pixel_size, zoom_factor, level, tx * tile_size, ty * tile_size, tile_size, tile_size)
+
+
+# Complex sample points of tile (level, tx, ty)
+def tile_points(base_pixel_size, zoom_factor, level, tx, ty, tile_size):
+    re, im = tile_axes(base_pixel_size, zoom_factor, level, tx, ty, tile_size)
+    return re[:, np.newaxis] + 1j * im[np.newaxis, :]
+
+
+# Tile indices (tx, ty) overlapping a width x height view whose top-left global pixel is (px0, py0)
+def tiles_for_view(px0, py0, width, height, tile_size):
+    tx_range = range(px0 // tile_size, (px0 + width - 1) // tile_size + 1)
+    ty_range = range(py0 // tile_size, (py0 + height - 1) // tile_size + 1)
+    return [(tx, ty) for ty in ty_range for tx in tx_range]
+
+
+# Bounded in-memory LRU of iteration-count tiles keyed by (level, tx, ty),
+# with an optional write-through spill of one .npy per tile that is memory
+# mapped back on a miss, so the cache survives across sessions
+class TileCache:
+    def __init__(self, max_bytes=256 * 2**20, spill_dir=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._tiles = OrderedDict()
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def __contains__(self, key):
+        return key in self._tiles or (self.spill_dir is not None and os.path.exists(self._spill_path(key)))
+
+    # Spill files are named by a hash of the tile indices, which at deep levels
+    # have far more digits than a file name may hold
+    def _spill_path(self, key):
+        level, tx, ty = (int(index) for index in key)
+        digest = hashlib.sha1(f"{level}_{tx}_{ty}".encode()).hexdigest()
+        return os.path.join(self.spill_dir, f"{level}_{digest}.npy")
+
+    def get(self, key):
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return tile
+
+        if self.spill_dir is not None:
+            path = self._spill_path(key)
+            if os.path.exists(path):
+                self.hits += 1
+                tile = np.load(path, mmap_mode="r")
+                self._remember(key, tile)
+                return tile
+
+        self.misses += 1
+        return None
+
+    def put(self, key, tile):
+        if self.spill_dir is not None:
+            path = self._spill_path(key)
+            if not os.path.exists(path):
+                # Write to a temporary name first so readers never see a partial tile
+                temporary = path + ".tmp.npy"
+                np.save(temporary, tile)
+                os.replace(temporary, path)
+        self._remember(key, tile)
+
+    def clear(self):
+        self._tiles.clear()
+        self.bytes = 0
+
+    def _remember(self, key, tile):
+        if key in self._tiles:
+            self.bytes -= self._cost(self._tiles.pop(key))
+        self._tiles[key] = tile
+        self.bytes += self._cost(tile)
+        # Evict least recently used tiles until the cap is met again
+        while self.bytes > self.max_bytes and len(self._tiles) > 1:
+            _, evicted = self._tiles.popitem(last=False)
+            self.bytes -= self._cost(evicted)
+
+    @staticmethod
+    def _cost(tile):
+        return tile.nbytes
+
+
+# Assemble a view from cached tiles, computing missing tiles with
+# compute_tile(level, tx, ty); returns the (width, height) count array
+def render_view(cache, level, px0, py0, width, height, tile_size, compute_tile, dtype=np.uint16):
+    counts = np.empty((width, height), dtype=dtype)
+    for tx, ty in tiles_for_view(px0, py0, width, height, tile_size):
+        key = (level, tx, ty)
+        tile = cache.get(key)
+        if tile is None:
+            tile = compute_tile(level, tx, ty)
+            cache.put(key, tile)
+
+        # Overlap of this tile with the view, in global pixels
+        gx0, gy0 = max(tx * tile_size, px0), max(ty * tile_size, py0)
+        gx1, gy1 = min((tx + 1) * tile_size, px0 + width), min((ty + 1) * tile_size, py0 + height)
+        counts[gx0 - px0:gx1 - px0, gy0 - py0:gy1 - py0] = \
+            tile[gx0 - tx * tile_size:gx1 - tx * tile_size, gy0 - ty * tile_size:gy1 - ty * tile_size]
+    return counts
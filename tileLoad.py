@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from tileCache import tiles_for_view
+
+# Load generator for tileServer.py. Several simulated users explore the same
+# region at once: each one zooms level by level towards a shared centre (its
+# views offset by up to --jitter pixels), and every view asks for all of its
+# tiles concurrently over the user's own keep-alive connections, the way
+# mandelbrotZoom.py does with TILE_SERVER set. Reports throughput, latency
+# percentiles per tile request and what the server did (from /stats):
+#   python tileLoad.py --users 8 --views 12
+#   python tileLoad.py --kind bifurcation --center 3.7 0.5 --users 4
+DEFAULT_URL = "http://127.0.0.1:8765"
+DEFAULT_CENTERS = {"mandelbrot": (-0.7436438870, 0.1318259042), "bifurcation": (3.7, 0.5)}
+DEFAULT_PERCENTILES = (50, 95, 99)
+
+
+async def _get(reader, writer, host, path):
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError(f"Server closed the connection before answering GET {path}")
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    body = await reader.readexactly(length)
+    return int(status_line.split()[1]), body
+
+
+async def _get_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        status, body = await _get(reader, writer, host, path)
+    finally:
+        writer.close()
+    if status != 200:
+        raise OSError(f"GET {path} returned {status}")
+    return json.loads(body)
+
+
+# Tile paths of a view_size view at a level, centred (plus offset pixels) on
+# `center`: on the viewer's lattice for Mandelbrot tiles, on the bifurcation
+# tile grid (population 1 at the top) otherwise
+def view_paths(kind, info, level, center, offset, view_size):
+    tile_size = info["tile_size"]
+    if kind == "mandelbrot":
+        pixel_size = info["base_pixel_size"] / info["zoom_factor"] ** level
+        cx, cy = round(center[0] / pixel_size), round(center[1] / pixel_size)
+        tiles = None
+    else:
+        rate_min, rate_max = info["growth_rates"]
+        pixels = tile_size * 2 ** level  # Pixels across the whole diagram at this level
+        cx = round((center[0] - rate_min) / (rate_max - rate_min) * pixels)
+        cy = round((1.0 - center[1]) * pixels)
+        tiles = 2 ** level
+    px0, py0 = cx - view_size[0] // 2 + offset[0], cy - view_size[1] // 2 + offset[1]
+    return [f"/{kind}/{level}/{tx}/{ty}.png"
+            for tx, ty in tiles_for_view(px0, py0, view_size[0], view_size[1], tile_size)
+            if tiles is None or (0 <= tx < tiles and 0 <= ty < tiles)]
+
+
+# Run the simulated users against a server and return the measurements:
+# per-request latencies (seconds), errors, wall time and the change of the
+# server's /stats counters
+async def run_load(url=DEFAULT_URL, kind="mandelbrot", users=8, connections=4, views=12, start_level=0,
+                   center=None, jitter=100, view_size=(800, 800), stagger=0.5, seed=0):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    info = (await _get_json(host, port, "/info"))[kind]
+    center = center or DEFAULT_CENTERS[kind]
+    levels = [level for level in range(start_level, start_level + views) if level <= info["max_level"]]
+    latencies = []
+    errors = []
+    before = await _get_json(host, port, "/stats")
+
+    async def user(index):
+        rng = random.Random(seed * 1000 + index)
+        await asyncio.sleep(rng.uniform(0, stagger))
+        streams = [await asyncio.open_connection(host, port) for _ in range(connections)]
+        try:
+            for level in levels:
+                offset = (rng.randint(-jitter, jitter), rng.randint(-jitter, jitter))
+                paths = deque(view_paths(kind, info, level, center, offset, view_size))
+
+                async def fetch(reader, writer):
+                    while paths:
+                        path = paths.popleft()
+                        start = time.perf_counter()
+                        status, _ = await _get(reader, writer, host, path)
+                        latencies.append(time.perf_counter() - start)
+                        if status != 200:
+                            errors.append((path, status))
+
+                await asyncio.gather(*(fetch(reader, writer) for reader, writer in streams))
+        finally:
+            for _, writer in streams:
+                writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(index) for index in range(users)))
+    seconds = time.perf_counter() - start
+    after = await _get_json(host, port, "/stats")
+    server = {name: after[name] - before[name] for name in ("requests", "computed", "coalesced", "cache_hits")}
+    return {"latencies": np.array(latencies), "errors": errors, "seconds": seconds, "server": server}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure tile throughput and latency of a running tileServer.py.")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--kind", choices=("mandelbrot", "bifurcation"), default="mandelbrot")
+    parser.add_argument("--users", type=int, default=8, help="simulated users exploring at the same time")
+    parser.add_argument("--connections", type=int, default=4, help="keep-alive connections per user")
+    parser.add_argument("--views", type=int, default=12, help="zoom levels each user walks through")
+    parser.add_argument("--start-level", type=int, default=0)
+    parser.add_argument("--center", type=float, nargs=2, metavar=("X", "Y"),
+                        help="zoom target (default: a point near the boundary / the chaotic band)")
+    parser.add_argument("--jitter", type=int, default=100, help="largest per-user view offset in pixels")
+    parser.add_argument("--view-size", type=int, nargs=2, default=(800, 800), metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--stagger", type=float, default=0.5,
+                        help="users start at random times within this many seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run_load(args.url, args.kind, args.users, args.connections, args.views, args.start_level,
+                                  args.center, args.jitter, tuple(args.view_size), args.stagger, args.seed))
+    latencies, server = result["latencies"], result["server"]
+    print(f"{latencies.size} tile requests ({len(result['errors'])} errors) in {result['seconds']:.2f} s: "
+          f"{latencies.size / result['seconds']:.1f} tiles/s")
+    if latencies.size:
+        values = np.percentile(latencies, DEFAULT_PERCENTILES) * 1000
+        print("Latency ms: " + "  ".join(f"p{p} {value:.1f}" for p, value in zip(DEFAULT_PERCENTILES, values)) +
+              f"  max {latencies.max() * 1000:.1f}")
+    print(f"Server: {server['computed']} tiles computed, {server['coalesced']} requests coalesced, "
+          f"{server['cache_hits']} cache hits")
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+import argparse
+import asyncio
+import http.client
+import json
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import suppress
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from chaosCore import DensityRaster, bifurcation_chunks, build_palette, escape_time
+from gridFile import count_dtype
+from pngWriter import encode_png
+from tileCache import TileCache, level_pixel_size, tile_points
+
+# Local tile server, so several people exploring the same regions share one
+# set of computed tiles instead of each recomputing them:
+#   python tileServer.py --port 8765
+#   GET /mandelbrot/{level}/{tx}/{ty}.png     palette-colored tile (.counts: raw iteration counts)
+#   GET /bifurcation/{level}/{tx}/{ty}.png    logistic map density tile
+#   GET /info, GET /stats                     lattice settings and cache/coalescing counters (JSON)
+# Mandelbrot tiles live on the zoom viewer's pixel lattice (tileCache), so
+# mandelbrotZoom.py can use the server as its tile source; .counts tiles are
+# tile_size x tile_size little-endian counts indexed [x, y]. Bifurcation level L
+# splits the growth rate range and the population range [0, 1] into 2**L x 2**L
+# tiles, ty = 0 at the top. The server is plain asyncio (HTTP/1.1 with
+# keep-alive, stdlib only): tiles are computed on a process pool, requests for a
+# tile that is already being computed wait for that computation instead of
+# starting another one, and finished tiles sit in a bounded LRU cache.
+HOST = "127.0.0.1"  # Local only
+PORT = 8765
+TILE_SIZE = 200  # Must match the viewer's TILE_SIZE for it to use the server
+MAX_ITER = 256
+ZOOM_FACTOR = 2
+BASE_PIXEL_SIZE = 4.0 / 800  # Level 0 pixel size of mandelbrotZoom
+DEEP_PIXEL_SIZE = 1e-13  # Deeper levels need perturbation (as in mandelbrotZoom) and are not served
+CACHE_MAX_BYTES = 256 * 2**20  # Encoded tiles kept in memory
+KEEPALIVE_TIMEOUT = 30  # Seconds an idle connection stays open
+MAX_HEADERS = 100
+DEFAULT_CONNECTIONS = 8  # Concurrent requests of one TileClient
+
+GROWTH_RATE_RANGE = (0.0, 4.0)  # Growth rates covered by bifurcation level 0
+INITIAL_POPULATION = 0.4
+BIFURCATION_TRANSIENT = 500  # Generations discarded per growth rate (deep tiles need settled orbits)
+BIFURCATION_SAMPLES = 200  # Generations kept per growth rate
+RATES_PER_PIXEL = 4  # Growth rates per pixel column of a bifurcation tile
+MAX_BIFURCATION_LEVEL = 24
+
+CONTENT_TYPES = {"png": "image/png", "counts": "application/octet-stream", "json": "application/json",
+                 "text": "text/plain; charset=utf-8"}
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           500: "Internal Server Error"}
+
+
+# Little-endian dtype of raw count tiles
+def counts_dtype(max_iter):
+    return np.dtype(count_dtype(max_iter)).newbyteorder("<")
+
+
+# Worker: one Mandelbrot tile as raw counts or as a PNG in the viewer's palette
+# (image rows along y, as the viewer shows the tile)
+def mandelbrot_tile(level, tx, ty, fmt, tile_size, max_iter, base_pixel_size):
+    c = tile_points(base_pixel_size, ZOOM_FACTOR, level, tx, ty, tile_size)
+    counts = escape_time(c, max_iter).astype(counts_dtype(max_iter))
+    if fmt == "counts":
+        return counts.tobytes()
+    return encode_png(build_palette(max_iter)[counts.T])
+
+
+# Worker: one bifurcation tile as a PNG. Hits are tone mapped against the most
+# a pixel can receive (every sample of every growth rate of its column), so
+# neighbouring tiles share one scale
+def bifurcation_tile(level, tx, ty, tile_size, initial_population, transient, samples, rates_per_pixel):
+    tiles = 2 ** level
+    rate_span = (GROWTH_RATE_RANGE[1] - GROWTH_RATE_RANGE[0]) / tiles
+    rate_min = GROWTH_RATE_RANGE[0] + tx * rate_span
+    population_max = 1.0 - ty / tiles
+    raster = DensityRaster(tile_size, tile_size, (rate_min, rate_min + rate_span),
+                           (population_max - 1.0 / tiles, population_max))
+    rate_count = tile_size * rates_per_pixel
+    growth_rates = rate_min + (np.arange(rate_count) + 0.5) * (rate_span / rate_count)
+    for rates, populations in bifurcation_chunks(growth_rates, initial_population, transient, samples):
+        raster.add(rates, populations)
+    return encode_png(raster.to_rgb(peak=rates_per_pixel * samples))
+
+
+class TileServer:
+    def __init__(self, workers=None, cache_bytes=CACHE_MAX_BYTES, tile_size=TILE_SIZE, max_iter=MAX_ITER,
+                 base_pixel_size=BASE_PIXEL_SIZE):
+        self.tile_size = tile_size
+        self.max_iter = max_iter
+        self.base_pixel_size = base_pixel_size
+        # Deepest level whose pixels are still at least DEEP_PIXEL_SIZE
+        self.max_level = 0
+        while level_pixel_size(base_pixel_size, ZOOM_FACTOR, self.max_level + 1) >= DEEP_PIXEL_SIZE:
+            self.max_level += 1
+        self.cache = TileCache(cache_bytes)
+        self.requests = 0
+        self.computed = 0  # Tiles computed on the pool
+        self.coalesced = 0  # Requests that joined a computation already in flight
+        self._pending = {}  # Tile key -> task computing it
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+
+    def info(self):
+        return {
+            "mandelbrot": {"tile_size": self.tile_size, "max_iter": self.max_iter, "zoom_factor": ZOOM_FACTOR,
+                           "base_pixel_size": self.base_pixel_size, "max_level": self.max_level,
+                           "dtype": counts_dtype(self.max_iter).str, "formats": ["png", "counts"]},
+            "bifurcation": {"tile_size": self.tile_size, "growth_rates": list(GROWTH_RATE_RANGE),
+                            "initial_population": INITIAL_POPULATION, "transient": BIFURCATION_TRANSIENT,
+                            "samples": BIFURCATION_SAMPLES, "max_level": MAX_BIFURCATION_LEVEL,
+                            "formats": ["png"]},
+        }
+
+    def stats(self):
+        return {"requests": self.requests, "computed": self.computed, "coalesced": self.coalesced,
+                "in_flight": len(self._pending), "cache_hits": self.cache.hits, "cache_misses": self.cache.misses,
+                "cached_tiles": len(self.cache), "cache_bytes": self.cache.bytes}
+
+    # Encoded tile for a key (kind, format, level, tx, ty) as a uint8 array:
+    # from the cache, from a computation already running, or computed now
+    async def tile(self, key):
+        tile = self.cache.get(key)
+        if tile is not None:
+            return tile
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute(key))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        else:
+            self.coalesced += 1
+        # A client hanging up must not cancel the computation others are waiting for
+        return await asyncio.shield(task)
+
+    async def _compute(self, key):
+        kind, fmt, level, tx, ty = key
+        if kind == "mandelbrot":
+            job = (mandelbrot_tile, level, tx, ty, fmt, self.tile_size, self.max_iter, self.base_pixel_size)
+        else:
+            job = (bifurcation_tile, level, tx, ty, self.tile_size, INITIAL_POPULATION, BIFURCATION_TRANSIENT,
+                   BIFURCATION_SAMPLES, RATES_PER_PIXEL)
+        payload = await asyncio.get_running_loop().run_in_executor(self._executor, *job)
+        self.computed += 1
+        tile = np.frombuffer(payload, dtype=np.uint8)
+        self.cache.put(key, tile)
+        return tile
+
+    # Why a tile address cannot be served, or None when it can
+    def _check(self, kind, fmt, level, tx, ty):
+        if kind == "mandelbrot":
+            if fmt not in ("png", "counts"):
+                return f"Unknown Mandelbrot tile format {fmt!r}"
+            if not 0 <= level <= self.max_level:
+                return f"Mandelbrot levels run from 0 to {self.max_level}"
+            return None
+        if fmt != "png":
+            return f"Unknown bifurcation tile format {fmt!r}"
+        if not 0 <= level <= MAX_BIFURCATION_LEVEL:
+            return f"Bifurcation levels run from 0 to {MAX_BIFURCATION_LEVEL}"
+        if not (0 <= tx < 2 ** level and 0 <= ty < 2 ** level):
+            return f"Bifurcation level {level} has tiles 0..{2 ** level - 1} on both axes"
+        return None
+
+    # (status, content type, body) answering a GET of `target`
+    async def respond(self, target):
+        path = urlsplit(target).path
+        if path == "/info":
+            return 200, CONTENT_TYPES["json"], json.dumps(self.info()).encode("utf-8")
+        if path == "/stats":
+            return 200, CONTENT_TYPES["json"], json.dumps(self.stats()).encode("utf-8")
+
+        parts = path.strip("/").split("/")
+        if len(parts) != 4 or parts[0] not in ("mandelbrot", "bifurcation"):
+            return 404, CONTENT_TYPES["text"], f"No such resource: {path}\n".encode("utf-8")
+        kind = parts[0]
+        name, _, fmt = parts[3].partition(".")
+        try:
+            level, tx, ty = int(parts[1]), int(parts[2]), int(name)
+        except ValueError:
+            return 404, CONTENT_TYPES["text"], f"Tile addresses are /{kind}/level/x/y, got {path}\n".encode("utf-8")
+        fmt = fmt or "png"
+        problem = self._check(kind, fmt, level, tx, ty)
+        if problem is not None:
+            return 404, CONTENT_TYPES["text"], (problem + "\n").encode("utf-8")
+        tile = await self.tile((kind, fmt, level, tx, ty))
+        return 200, CONTENT_TYPES[fmt], tile.data
+
+    # Serve one connection: requests are answered in order until the client
+    # closes it, asks for Connection: close or stays idle for KEEPALIVE_TIMEOUT
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                headers = {}
+                for _ in range(MAX_HEADERS):
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if "content-length" in headers:
+                    await reader.readexactly(int(headers["content-length"]))
+
+                request = request_line.decode("latin-1").split()
+                if len(request) != 3:
+                    await self._send(writer, 400, CONTENT_TYPES["text"], b"Malformed request line\n", False)
+                    break
+                method, target, version = request
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                if method != "GET":
+                    status, content_type, body = 405, CONTENT_TYPES["text"], b"Only GET is supported\n"
+                else:
+                    self.requests += 1
+                    try:
+                        status, content_type, body = await self.respond(target)
+                    except Exception as error:
+                        status, content_type, body = 500, CONTENT_TYPES["text"], f"{error!r}\n".encode("utf-8")
+                await self._send(writer, status, content_type, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass  # Client went away or sent something unusable (e.g. an overlong line)
+        finally:
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+    @staticmethod
+    async def _send(writer, status, content_type, body, keep_alive):
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1"))
+        writer.write(body)
+        await writer.drain()
+
+    async def serve(self, host=HOST, port=PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            print(f"Serving tiles on http://{host}:{port} (Mandelbrot levels 0..{self.max_level}, "
+                  f"tile size {self.tile_size}, max_iter {self.max_iter})")
+            await server.serve_forever()
+
+
+# Blocking client used by the zoom viewer: fetches raw count tiles from a
+# server whose lattice matches the viewer's, several at a time, each worker
+# thread keeping its own keep-alive connection. Failures raise OSError.
+class TileClient:
+    def __init__(self, url, tile_size=TILE_SIZE, max_iter=MAX_ITER, base_pixel_size=BASE_PIXEL_SIZE,
+                 connections=DEFAULT_CONNECTIONS, timeout=30):
+        parts = urlsplit(url)
+        self.url = url
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.tile_size = tile_size
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=connections)
+
+        info = json.loads(self.get("/info"))["mandelbrot"]
+        expected = {"tile_size": tile_size, "max_iter": max_iter, "base_pixel_size": base_pixel_size,
+                    "zoom_factor": ZOOM_FACTOR}
+        mismatched = [name for name, value in expected.items() if info[name] != value]
+        if mismatched:
+            raise ValueError(f"Tile server {url} uses a different lattice ({', '.join(mismatched)} differ)")
+        self.max_level = info["max_level"]
+        self.dtype = np.dtype(info["dtype"])
+
+    def close(self):
+        self._pool.shutdown(cancel_futures=True)
+
+    # Body of a GET request; a keep-alive connection the server has since
+    # closed is reopened once
+    def get(self, path):
+        for attempt in range(2):
+            connection = getattr(self._local, "connection", None)
+            if connection is None:
+                connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                self._local.connection = connection
+            try:
+                connection.request("GET", path)
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (OSError, http.client.HTTPException) as error:
+                connection.close()
+                self._local.connection = None
+                stale = isinstance(error, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+                if attempt or not stale:
+                    raise OSError(f"GET {self.url}{path} failed: {error!r}") from error
+        if response.status != 200:
+            raise OSError(f"GET {self.url}{path} returned {response.status}: {body.decode('utf-8', 'replace').strip()}")
+        return body
+
+    def mandelbrot_tile(self, level, tx, ty):
+        body = self.get(f"/mandelbrot/{level}/{tx}/{ty}.counts")
+        return np.frombuffer(body, dtype=self.dtype).reshape(self.tile_size, self.tile_size)
+
+    # (key, tile) pairs for keys (level, tx, ty), fetched concurrently
+    def mandelbrot_tiles(self, keys):
+        return zip(keys, self._pool.map(lambda key: self.mandelbrot_tile(*key), keys))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Mandelbrot and bifurcation tiles over HTTP on localhost.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--cache-mb", type=float, default=CACHE_MAX_BYTES / 2**20, help="memory for cached tiles")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE)
+    parser.add_argument("--max-iter", type=int, default=MAX_ITER)
+    args = parser.parse_args(argv)
+
+    server = TileServer(args.workers, int(args.cache_mb * 2**20), args.tile_size, args.max_iter)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        print(f"Stopped: {server.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
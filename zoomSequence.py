@@ -0,0 +1,260 @@
+import math
+import queue
+import threading
+import time
+from decimal import ROUND_FLOOR, Decimal, localcontext
+
+import numpy as np
+
+from escapeTime import escape_time
+from gridFile import count_dtype
+from parallelRender import ParallelRenderer
+from perturbation import PerturbationKernel, lattice_precision
+from pngWriter import write_png
+from posterRender import colormap_lut
+from tileCache import block_axes, level_pixel_size
+
+# Zoom sequences (animation frames) into a fixed centre. Frame k has pixel size
+# p_0 / zoom_rate**k. Instead of rendering every frame on its own, frames sample
+# the integer pixel lattice of tileCache with zoom factor 2: frame k uses the
+# coarsest lattice level at least as fine as its pixels, and each of its pixels
+# takes the count of the nearest lattice point (at most half a frame pixel away).
+# Frames zooming into one centre are nested, so the shallowest frame of a level
+# bounds every other frame of that level: one block of lattice points (at most
+# 2W x 2H) serves all of them. Only the block cells some frame of the level
+# samples are filled, so a level never costs more than rendering its frames
+# directly, and since every lattice point of level L is also a point of level
+# L + 1, the cells the previous block already holds are copied from it.
+# Levels below DEEP_PIXEL_SIZE are computed by
+# perturbation, so the centre may be given as a decimal string of any precision.
+#
+# Export runs as a pipeline of threads connected by bounded queues: a block
+# stage computes lattice blocks (one level ahead, on the process pool), the
+# frame stage resamples them, a colorizer maps counts through the palette and
+# several encoders write the PNGs, so compute and I/O overlap.
+ZOOM_FACTOR = 2
+DEEP_PIXEL_SIZE = 1e-13  # Below this pixel size float64 lattice coordinates run out (as in mandelbrotZoom)
+DEFAULT_QUEUE_SIZE = 8  # Frames waiting between two stages
+DEFAULT_ENCODERS = 2  # PNG encoder threads (zlib releases the GIL)
+_DONE = object()  # End-of-stream marker passed down the queues
+
+
+# Integer and fractional part of value / pixel_size at a lattice level (value may be a decimal string)
+def _lattice_position(value, base_pixel_size, level):
+    pixel_size = level_pixel_size(base_pixel_size, ZOOM_FACTOR, level)
+    with localcontext() as context:
+        context.prec = lattice_precision(pixel_size) + 10
+        position = Decimal(value) / (Decimal(base_pixel_size) / Decimal(ZOOM_FACTOR) ** level)
+        whole = int(position.to_integral_value(rounding=ROUND_FLOOR))
+        return whole, float(position - whole)
+
+
+# Geometry of a zoom sequence and its lattice blocks
+class ZoomSequence:
+    def __init__(self, center_re, center_im, frames, zoom_rate, width, height, max_iter, start_width=4.0):
+        if zoom_rate <= 1.0:
+            raise ValueError(f"zoom_rate must be greater than 1, got {zoom_rate}")
+        self.center_re, self.center_im = center_re, center_im
+        self.frames = frames
+        self.zoom_rate = zoom_rate
+        self.width, self.height = width, height
+        self.max_iter = max_iter
+        self.base_pixel_size = start_width / width  # Level 0 is the first frame's pixel size
+        self._centers = {}
+
+    def pixel_size(self, frame):
+        return self.base_pixel_size / self.zoom_rate ** frame
+
+    # Coarsest lattice level whose pixels are no larger than the frame's
+    def level(self, frame):
+        return max(0, math.ceil(frame * math.log2(self.zoom_rate) - 1e-9))
+
+    # Frames grouped by lattice level, shallowest first
+    def levels(self):
+        grouped = {}
+        for frame in range(self.frames):
+            grouped.setdefault(self.level(frame), []).append(frame)
+        return grouped
+
+    # Lattice position (integer, fraction) of the centre on both axes at a level
+    def center(self, level):
+        if level not in self._centers:
+            self._centers[level] = (_lattice_position(self.center_re, self.base_pixel_size, level),
+                                    _lattice_position(self.center_im, self.base_pixel_size, level))
+        return self._centers[level]
+
+    # Lattice offsets from the centre's integer position of every frame column
+    # and row (rows from the top of the image, i.e. decreasing imaginary part)
+    def sample_offsets(self, frame):
+        level = self.level(frame)
+        (_, fx), (_, fy) = self.center(level)
+        ratio = self.pixel_size(frame) / level_pixel_size(self.base_pixel_size, ZOOM_FACTOR, level)
+        columns = np.rint(fx + (np.arange(self.width) + 0.5 - self.width / 2) * ratio).astype(np.int64)
+        rows = np.rint(fy + (self.height / 2 - np.arange(self.height) - 0.5) * ratio).astype(np.int64)
+        return columns, rows
+
+    # Global lattice origin (gx0, gy0) and (height, width) of the block serving a level
+    def block_extent(self, level, frames):
+        columns, rows = self.sample_offsets(frames[0])  # The shallowest frame covers the others
+        (cx, _), (cy, _) = self.center(level)
+        return (cx + int(columns.min()), cy + int(rows.min()),
+                (int(rows.max() - rows.min()) + 1, int(columns.max() - columns.min()) + 1))
+
+    # (height, width) mask of the block cells sampled by any of a level's frames
+    def sampled_cells(self, level, frames, origin, shape):
+        (cx, _), (cy, _) = self.center(level)
+        sampled = np.zeros(shape, dtype=bool)
+        for frame in frames:
+            columns, rows = self.sample_offsets(frame)
+            sampled[np.ix_(rows + (cy - origin[1]), columns + (cx - origin[0]))] = True
+        return sampled
+
+    def is_deep(self, level):
+        return level_pixel_size(self.base_pixel_size, ZOOM_FACTOR, level) < DEEP_PIXEL_SIZE
+
+    # Counts of a level's block, indexed [y, x] from its origin (ascending imaginary
+    # part), with a mask of the cells that hold one: the cells the level's frames
+    # sample. Cells the previous level's block (level - 1, its origin, counts and
+    # mask) holds are copied; only the rest is computed. Returns (block, computed)
+    def compute_block(self, level, frames, previous=None, renderer=None):
+        gx0, gy0, shape = self.block_extent(level, frames)
+        counts = np.zeros(shape, dtype=count_dtype(self.max_iter))
+        known = np.zeros(shape, dtype=bool)
+        if previous is not None and previous[0] == level - 1:
+            _, (px0, py0), parent, parent_known = previous
+            # Block cell (a, b) is global point 2g of this level, i.e. point g of the parent level,
+            # when gx0 + a is even; the offsets below are small even when gx0 is huge
+            xs = np.arange((gx0 % 2), shape[1], 2)
+            ys = np.arange((gy0 % 2), shape[0], 2)
+            parent_xs = (gx0 - 2 * px0 + xs) // 2
+            parent_ys = (gy0 - 2 * py0 + ys) // 2
+            inside_x = (parent_xs >= 0) & (parent_xs < parent.shape[1])
+            inside_y = (parent_ys >= 0) & (parent_ys < parent.shape[0])
+            xs, parent_xs = xs[inside_x], parent_xs[inside_x]
+            ys, parent_ys = ys[inside_y], parent_ys[inside_y]
+            counts[np.ix_(ys, xs)] = parent[np.ix_(parent_ys, parent_xs)]
+            known[np.ix_(ys, xs)] = parent_known[np.ix_(parent_ys, parent_xs)]
+
+        ys, xs = np.nonzero(self.sampled_cells(level, frames, (gx0, gy0), shape) & ~known)
+        if ys.size:
+            if self.is_deep(level):
+                kernel = PerturbationKernel(self.base_pixel_size, ZOOM_FACTOR, level, gx0, gy0,
+                                            shape[1], shape[0], self.max_iter)
+                counts[ys, xs] = kernel(xs, ys)
+            else:
+                re, im = block_axes(self.base_pixel_size, ZOOM_FACTOR, level, gx0, gy0, shape[1], shape[0])
+                points = re[xs] + 1j * im[ys]
+                if renderer is not None:
+                    counts[ys, xs] = renderer.render_points(points, self.max_iter, out_dtype=counts.dtype)
+                else:
+                    counts[ys, xs] = escape_time(points, self.max_iter)
+            known[ys, xs] = True
+        return (level, (gx0, gy0), counts, known), int(ys.size)
+
+    # (height, width) counts of a frame, taken from its level's block
+    def frame_counts(self, frame, block):
+        level, (gx0, gy0), counts, _ = block
+        columns, rows = self.sample_offsets(frame)
+        (cx, _), (cy, _) = self.center(level)
+        return counts[np.ix_(rows + (cy - gy0), columns + (cx - gx0))]
+
+
+# Drain a queue until the end-of-stream marker (after a stage has failed)
+def _drain(inbox):
+    while inbox.get() is not _DONE:
+        pass
+
+
+# Render every frame of a sequence to PNG files named pattern.format(frame).
+# workers=1 computes in this thread, anything else on a process pool.
+# progress(frames_written, total) is called from the encoder threads.
+# Returns statistics: frames, computed_points, direct_points (what rendering
+# every frame on its own would compute, never less than computed_points) and seconds.
+def export_zoom_sequence(sequence, pattern="frame_{:05d}.png", colormap="bands", workers=None,
+                         queue_size=DEFAULT_QUEUE_SIZE, encoders=DEFAULT_ENCODERS, progress=None):
+    start = time.perf_counter()
+    lut = colormap_lut(colormap, sequence.max_iter)
+    levels = sequence.levels()
+    blocks = queue.Queue(maxsize=1)  # The block stage runs one level ahead of the frames
+    counts_queue = queue.Queue(maxsize=queue_size)
+    pixels_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    lock = threading.Lock()
+    stats = {"frames": sequence.frames, "computed_points": 0, "written": 0,
+             "direct_points": sequence.frames * sequence.width * sequence.height}
+
+    def compute_blocks():
+        renderer = ParallelRenderer(workers) if workers != 1 else None
+        try:
+            previous = None
+            for level, frames in levels.items():
+                if stop.is_set():
+                    break
+                previous, computed = sequence.compute_block(level, frames, previous, renderer)
+                stats["computed_points"] += computed
+                blocks.put((previous, frames))
+        except BaseException as error:
+            errors.append(error)
+        finally:
+            if renderer is not None:
+                renderer.close()
+            blocks.put(_DONE)
+
+    def colorize():
+        try:
+            while (item := counts_queue.get()) is not _DONE:
+                frame, counts = item
+                pixels_queue.put((frame, lut[counts]))
+        except BaseException as error:
+            errors.append(error)
+            _drain(counts_queue)
+        finally:
+            for _ in range(encoders):
+                pixels_queue.put(_DONE)
+
+    def encode():
+        try:
+            while (item := pixels_queue.get()) is not _DONE:
+                frame, pixels = item
+                write_png(pattern.format(frame), pixels)
+                with lock:
+                    stats["written"] += 1
+                    written = stats["written"]
+                if progress is not None:
+                    progress(written, sequence.frames)
+        except BaseException as error:
+            errors.append(error)
+            _drain(pixels_queue)
+
+    threads = [threading.Thread(target=compute_blocks, daemon=True), threading.Thread(target=colorize, daemon=True)]
+    threads += [threading.Thread(target=encode, daemon=True) for _ in range(encoders)]
+    for thread in threads:
+        thread.start()
+
+    # Frame stage: resample each block into the frames of its level
+    blocks_done = False
+    try:
+        while (item := blocks.get()) is not _DONE:
+            block, frames = item
+            for frame in frames:
+                if errors:
+                    break
+                counts_queue.put((frame, sequence.frame_counts(frame, block)))
+            if errors:
+                break
+        else:
+            blocks_done = True
+    finally:
+        if not blocks_done:
+            stop.set()
+            _drain(blocks)
+        counts_queue.put(_DONE)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+
+    stats["seconds"] = time.perf_counter() - start
+    del stats["written"]
+    return stats